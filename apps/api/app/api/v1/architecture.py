@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from bson import ObjectId
-from app.services.analysis.architecture import build_architecture
+from app.services.analysis.views import get_analysis_view
 
 router = APIRouter(tags=["analysis"])
 
@@ -11,5 +11,7 @@ async def repo_architecture(repo_id: str):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid repo_id")
 
-    flows = await build_architecture(rid)
-    return {"repo_id": repo_id, "flows": flows}
\ No newline at end of file
+    view = await get_analysis_view(rid, "architecture")
+    if view is None:
+        raise HTTPException(status_code=404, detail="Repo not indexed")
+    return {"repo_id": repo_id, "flows": view["flows"]}
@@ -1,88 +1,334 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 
-from typing import Dict, List
-from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from bson import ObjectId
 
 from app.db.mongo import get_db
+from app.db.repos import get_repo_status
 from app.core.config import settings
-from app.schemas.chat import AskRequest, AskResponse
-from app.services.rag.answerer import generate_answer
-from app.services.llm.gemini_chat import LLMRateLimitError
+from app.schemas.chat import AskRequest, AskResponse, BatchAskRequest
+from app.services.embeddings.query_embedder import embed_queries
+from app.services.rag.canonical import match_canonical
+from app.services.rag.history import (
+    MESSAGES,
+    SESSIONS,
+    history_from,
+    recent_messages,
+    save_llm_context,
+    update_session_summary,
+)
+from app.services.rag.answerer import format_sources, generate_answer, prepare_answer, retrieve_chunks, stream_llm
+from app.services.llm.errors import LLMRateLimitError
+from app.services.llm.scheduler import LLM_SCHEDULER, Priority, SchedulerSaturatedError
 
 router = APIRouter(tags=["chat"])
 
-SESSIONS = "chat_sessions"
-MESSAGES = "chat_messages"
-CODE_CHUNKS = "code_chunks"
+NOT_INDEXED = "Repo not indexed yet. Run /ingest and wait for job done."
 
-async def _get_recent_history(session_oid: ObjectId) -> List[Dict[str, str]]:
-    db = get_db()
-    # last N turns = 2N messages (user+assistant)
-    limit = settings.CHAT_HISTORY_MAX_TURNS * 2
-    cursor = db[MESSAGES].find(
-        {"session_id": session_oid},
-        projection={"role": 1, "content": 1, "_id": 0},
-    ).sort("created_at", -1).limit(limit)
-    msgs = await cursor.to_list(length=limit)
-    msgs.reverse()
-    return [{"role": m["role"], "content": m["content"]} for m in msgs]
 
-@router.post("/repos/{repo_id}/ask", response_model=AskResponse)
-async def ask_repo(repo_id: str, payload: AskRequest):
+@dataclass
+class _Turn:
+    repo_oid: ObjectId
+    session_oid: ObjectId
+    history: List[Dict[str, str]]  # earlier turns (summary + recent messages), not the current question
+    asked_at: datetime
+    has_llm_context: bool = False  # the session holds model-side context to continue
+    retrieval: Optional[asyncio.Task] = None  # prefetched retrieval for the question
+
+
+def _prefetch(coro) -> asyncio.Task:
+    """Start work whose result a later call joins (single-flight); failures surface there."""
+    task = asyncio.create_task(coro)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+async def _start_turn(repo_id: str, payload: AskRequest) -> _Turn:
+    """
+    Shared /ask preamble, with the round-trips overlapped:
+    - retrieval for the question (query embedding first) starts right away;
+      generate_answer / prepare_answer later join it
+    - indexed check (cached repo status), session lookup or insert and the
+      recent messages run concurrently
+    Nothing is written for the messages here: the user and assistant
+    messages are saved together once the answer is out (_save_turn).
+    """
     db = get_db()
+    asked_at = datetime.utcnow()
 
     try:
         repo_oid = ObjectId(repo_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid repo_id")
+    try:
+        session_oid = ObjectId(payload.session_id) if payload.session_id else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+
+    retrieval = _prefetch(retrieve_chunks(repo_oid, payload.question, k=payload.top_k))
+    try:
+        if session_oid is not None:
+            status, sess, msgs = await asyncio.gather(
+                get_repo_status(repo_oid),
+                db[SESSIONS].find_one(
+                    {"_id": session_oid, "repo_id": repo_oid},
+                    {"summary": 1, "summary_upto": 1, "llm_context.model": 1},
+                ),
+                recent_messages(session_oid),
+            )
+            if not status["indexed"]:
+                raise HTTPException(status_code=409, detail=NOT_INDEXED)
+            if not sess:
+                raise HTTPException(status_code=404, detail="Session not found for this repo")
+            history = history_from(sess, msgs)
+            has_llm_context = bool(sess.get("llm_context"))
+        else:
+            status = await get_repo_status(repo_oid)
+            if not status["indexed"]:
+                raise HTTPException(status_code=409, detail=NOT_INDEXED)
+            session_oid = ObjectId()
+            await db[SESSIONS].insert_one({"_id": session_oid, "repo_id": repo_oid, "created_at": asked_at})
+            history = []
+            has_llm_context = False
+    except BaseException:
+        retrieval.cancel()
+        raise
 
-    # Guard: repo must be indexed (code_chunks exist)
-    chunk_count = await db[CODE_CHUNKS].count_documents({"repo_id": repo_oid})
-    if chunk_count == 0:
-        raise HTTPException(status_code=409, detail="Repo not indexed yet. Run /ingest and wait for job done.")
+    return _Turn(repo_oid, session_oid, history, asked_at, has_llm_context, retrieval)
 
-    # Session handling
-    if payload.session_id:
-        try:
-            session_oid = ObjectId(payload.session_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid session_id")
-        sess = await db[SESSIONS].find_one({"_id": session_oid, "repo_id": repo_oid})
-        if not sess:
-            raise HTTPException(status_code=404, detail="Session not found for this repo")
-    else:
-        res = await db[SESSIONS].insert_one({"repo_id": repo_oid, "created_at": datetime.utcnow()})
-        session_oid = res.inserted_id
-
-    # Save user message
-    await db[MESSAGES].insert_one({
-        "session_id": session_oid,
-        "repo_id": repo_oid,
+
+def _drop_prefetch(turn: _Turn) -> None:
+    """Stop a prefetched retrieval the answer didn't need (canonical / cache hit); no-op once done."""
+    if turn.retrieval is not None:
+        turn.retrieval.cancel()
+
+
+async def _save_turn(turn: _Turn, question: str, answer: Optional[str]) -> None:
+    """User message (+ assistant answer, if any) in one write."""
+    db = get_db()
+    docs = [{
+        "session_id": turn.session_oid,
+        "repo_id": turn.repo_oid,
         "role": "user",
-        "content": payload.question,
-        "created_at": datetime.utcnow(),
-    })
+        "content": question,
+        "created_at": turn.asked_at,
+    }]
+    if answer is not None:
+        docs.append({
+            "session_id": turn.session_oid,
+            "repo_id": turn.repo_oid,
+            "role": "assistant",
+            "content": answer,
+            "created_at": max(datetime.utcnow(), turn.asked_at + timedelta(milliseconds=1)),
+        })
+    await db[MESSAGES].insert_many(docs, ordered=True)
 
-    history = await _get_recent_history(session_oid)
+
+@router.post("/repos/{repo_id}/ask", response_model=AskResponse)
+async def ask_repo(repo_id: str, payload: AskRequest, background_tasks: BackgroundTasks):
+    turn = await _start_turn(repo_id, payload)
+
+    canned = await match_canonical(turn.repo_oid, payload.question)
+    if canned is not None:
+        _drop_prefetch(turn)
+        # answered without the model: its session context no longer covers the conversation
+        if turn.has_llm_context:
+            background_tasks.add_task(save_llm_context, turn.session_oid, None)
+        background_tasks.add_task(_save_turn, turn, payload.question, canned["answer"])
+        background_tasks.add_task(update_session_summary, turn.session_oid)
+        return AskResponse(
+            session_id=str(turn.session_oid),
+            answer=canned["answer"],
+            sources=canned["sources"],
+            cached=True,
+            prompt_usage=canned.get("prompt_usage"),
+        )
 
     try:
-        rag = await generate_answer(repo_oid, payload.question, history=history, k=payload.top_k)
-    except LLMRateLimitError:
-        raise HTTPException(
-            status_code=429,
-            detail="LLM quota exceeded. Add billing/paid tier for Gemini, or switch to a local fallback model."
+        rag = await generate_answer(
+            turn.repo_oid,
+            payload.question,
+            history=turn.history,
+            k=payload.top_k,
+            session_oid=turn.session_oid,
+            deadline_ms=payload.deadline_ms,
+            has_llm_context=turn.has_llm_context,
+        )
+    except Exception as e:
+        # error responses skip background tasks: keep the question in the session now
+        await _save_turn(turn, payload.question, None)
+        if isinstance(e, LLMRateLimitError):
+            raise HTTPException(
+                status_code=429,
+                detail="LLM quota exceeded. Add billing/paid tier for Gemini, or switch to a local fallback model."
+            )
+        raise
+    finally:
+        # an answer-cache hit never joins the prefetched retrieval
+        _drop_prefetch(turn)
+
+    # persisted after the response is sent; tasks run in order
+    background_tasks.add_task(_save_turn, turn, payload.question, rag["answer"])
+    background_tasks.add_task(update_session_summary, turn.session_oid)
+
+    return AskResponse(
+        session_id=str(turn.session_oid),
+        answer=rag["answer"],
+        sources=rag["sources"],
+        cached=rag.get("cached", False),
+        prompt_usage=rag.get("prompt_usage"),
+        degradations=rag.get("degradations", []),
+    )
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/repos/{repo_id}/ask/stream")
+async def ask_repo_stream(repo_id: str, payload: AskRequest):
+    """
+    /ask over Server-Sent Events:
+    - `sources` as soon as retrieval finishes
+    - `token` events as the model streams its answer
+    - `done` (answer + final sources) when the model finishes
+    - `error` if generation fails mid-stream
+    The turn is saved after the last event, then the session summary updated.
+    """
+    # reject up front while a 503 can still be sent; the slot is taken in stream_llm
+    LLM_SCHEDULER.admit(Priority.INTERACTIVE)
+    turn = await _start_turn(repo_id, payload)
+    session_oid = turn.session_oid
+    result: Dict[str, str] = {}
+
+    canned = await match_canonical(turn.repo_oid, payload.question)
+    if canned is not None:
+        _drop_prefetch(turn)
+        result["answer"] = canned["answer"]
+        if turn.has_llm_context:
+            await save_llm_context(session_oid, None)
+        events = [
+            _sse("sources", {"session_id": str(session_oid), "sources": canned["sources"],
+                             "prompt_usage": canned.get("prompt_usage")}),
+            _sse("token", {"text": canned["answer"]}),
+            _sse("done", {"session_id": str(session_oid), "answer": canned["answer"], "sources": canned["sources"]}),
+        ]
+        return StreamingResponse(
+            iter(events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(_finish_stream, turn, payload.question, result),
         )
 
-    # Save assistant message
-    await db[MESSAGES].insert_one({
-        "session_id": session_oid,
-        "repo_id": repo_oid,
-        "role": "assistant",
-        "content": rag["answer"],
-        "created_at": datetime.utcnow(),
-    })
+    try:
+        packed = await prepare_answer(turn.repo_oid, payload.question, turn.history, k=payload.top_k)
+    except Exception:
+        await _save_turn(turn, payload.question, None)
+        raise
+    if turn.has_llm_context:
+        # streamed from the full prompt: the model-side context won't include this turn
+        await save_llm_context(session_oid, None)
+    sources = format_sources(packed.chunks)
+
+    async def stream():
+        yield _sse("sources", {
+            "session_id": str(session_oid),
+            "sources": sources,
+            "prompt_usage": packed.usage,
+        })
+        parts: List[str] = []
+        try:
+            async for piece in stream_llm(packed.prompt):
+                parts.append(piece)
+                yield _sse("token", {"text": piece})
+        except LLMRateLimitError:
+            yield _sse("error", {"detail": "LLM quota exceeded"})
+            return
+        except SchedulerSaturatedError as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": str(e) or e.__class__.__name__})
+            return
+
+        answer = result["answer"] = "".join(parts).strip()
+        if answer.startswith("Not found in this repository."):
+            final_sources = []
+        else:
+            final_sources = sources
+        yield _sse("done", {"session_id": str(session_oid), "answer": answer, "sources": final_sources})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_finish_stream, turn, payload.question, result),
+    )
+
+async def _finish_stream(turn: _Turn, question: str, result: Dict[str, str]) -> None:
+    await _save_turn(turn, question, result.get("answer"))
+    await update_session_summary(turn.session_oid)
+
+@router.post("/repos/{repo_id}/ask/batch")
+async def ask_repo_batch(repo_id: str, payload: BatchAskRequest):
+    """
+    Answer many questions in one call, streamed back as NDJSON in completion order.
+    - all question embeddings in one batched model call
+    - retrieval for every question runs concurrently
+    - LLM generations share a bounded pool (BATCH_ASK_CONCURRENCY)
+    Questions are answered independently: no session, no history.
+    """
+    try:
+        repo_oid = ObjectId(repo_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid repo_id")
+
+    if not (await get_repo_status(repo_oid))["indexed"]:
+        raise HTTPException(status_code=409, detail=NOT_INDEXED)
+
+    questions = payload.questions
+    try:
+        await embed_queries(questions)
+    except Exception:
+        pass  # each question embeds on its own during retrieval
+
+    llm_slots = asyncio.Semaphore(max(1, settings.BATCH_ASK_CONCURRENCY))
+
+    async def answer_one(i: int, question: str) -> Dict[str, Any]:
+        try:
+            rag = await match_canonical(repo_oid, question, Priority.BULK)
+            if rag is not None:
+                rag["cached"] = True
+            else:
+                rag = await generate_answer(
+                    repo_oid, question, history=[], k=payload.top_k, llm_slots=llm_slots, priority=Priority.BULK
+                )
+        except LLMRateLimitError:
+            return {"index": i, "question": question, "error": "LLM quota exceeded"}
+        except Exception as e:
+            return {"index": i, "question": question, "error": str(e) or e.__class__.__name__}
+        return {
+            "index": i,
+            "question": question,
+            "answer": rag["answer"],
+            "sources": rag["sources"],
+            "cached": rag.get("cached", False),
+            "prompt_usage": rag.get("prompt_usage"),
+        }
+
+    async def stream():
+        tasks = [asyncio.create_task(answer_one(i, q)) for i, q in enumerate(questions)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
 
-    return AskResponse(session_id=str(session_oid), answer=rag["answer"], sources=rag["sources"])
\ No newline at end of file
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 from bson import ObjectId
 from app.db.mongo import get_db
+from app.core.cache import cache_stats
+from app.services.rag.answer_cache import ANSWER_CACHE
+from app.services.llm.router import LLM_ROUTER
+from app.services.llm.scheduler import LLM_SCHEDULER
 
 router = APIRouter(tags=["debug"])
 
@@ -23,4 +27,16 @@ async def chunk_count(repo_id: str):
         {"repo_id": repo_oid},
         {"_id": 1, "repo_id": 1, "path": 1}
     )
-    return {"repo_id": repo_id, "count": n, "sample": _stringify_ids(sample)}
\ No newline at end of file
+    return {"repo_id": repo_id, "count": n, "sample": _stringify_ids(sample)}
+
+@router.get("/debug/cache")
+async def cache_counters():
+    return {"caches": {**cache_stats(), "answers": ANSWER_CACHE.stats()}}
+
+@router.get("/debug/scheduler")
+async def scheduler_stats():
+    return LLM_SCHEDULER.stats()
+
+@router.get("/debug/providers")
+async def provider_health():
+    return LLM_ROUTER.stats()
@@ -1,24 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from bson import ObjectId
-from app.db.mongo import get_db
-from app.services.analysis.entrypoints import extract_entrypoints
+from app.services.analysis.views import get_analysis_view
 
 router = APIRouter(tags=["entrypoints"])
 
 @router.get("/repos/{repo_id}/entrypoints")
 async def repo_entrypoints(repo_id: str):
     repo_oid = ObjectId(repo_id)
-    db = get_db()
-
-    chunks = await db.code_chunks.find(
-        {"repo_id": repo_oid, "path": {"$regex": "\\.py$"}}
-    ).to_list(length=500)
-
-    entrypoints = extract_entrypoints(chunks)
-
-    return {
-        "repo_id": repo_id,
-        "framework": "FastAPI",
-        "entrypoints": entrypoints,
-        "confidence": "high" if entrypoints["application"] else "medium"
-    }
\ No newline at end of file
+    view = await get_analysis_view(repo_oid, "entrypoints")
+    if view is None:
+        raise HTTPException(status_code=404, detail="Repo not indexed")
+    return {"repo_id": repo_id, **view}
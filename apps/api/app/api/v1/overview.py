@@ -1,8 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from bson import ObjectId
 from app.schemas.overview import RepoOverview
-from app.services.overview.builder import build_overview
-from app.services.overview.summary import generate_summary
+from app.services.analysis.views import get_analysis_view
 
 router = APIRouter(tags=["overview"])
 
@@ -13,24 +12,16 @@ async def repo_overview(repo_id: str):
     except Exception:
         raise HTTPException(400, "Invalid repo_id")
 
-    base = await build_overview(rid)
-    if not base["components"]:
+    view = await get_analysis_view(rid, "overview")
+    if view is None or not view["components"]:
         raise HTTPException(404, "Repo not indexed")
 
-    summary = generate_summary(
-        components=base["components"],
-        tech_stack=base["tech_stack"],
-    )
-
     return RepoOverview(
         repo_id=repo_id,
-        summary=summary,
-        components=base["components"],
-        data_flow=[
-            "GitHub repository → file tree → chunks",
-            "Chunks → embeddings → vector index",
-            "Query → retrieval → answer",
-        ],
-        tech_stack=base["tech_stack"],
-        confidence=base["confidence"],
-    )
\ No newline at end of file
+        summary=view.get("summary") or "",
+        summary_status=view.get("summary_status", "ready"),
+        components=view["components"],
+        data_flow=view["data_flow"],
+        tech_stack=view["tech_stack"],
+        confidence=view["confidence"],
+    )
@@ -5,7 +5,7 @@ import re
 
 from app.core.config import settings
 from app.db.mongo import get_db
-from app.services.embeddings.ollama_embedder import OllamaEmbedder
+from app.services.embeddings.query_embedder import embed_query
 
 router = APIRouter(tags=["search"])
 
@@ -18,8 +18,7 @@ async def semantic_search(repo_id: str, q: str, k: int = 8):
         raise HTTPException(status_code=400, detail="Invalid repo_id")
 
     try:
-        embedder = OllamaEmbedder()
-        query_vec = embedder.embed_text(q)
+        query_vec = await embed_query(q)
         pipeline = [
             {
                 "$vectorSearch": {
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from bson import ObjectId
+from app.services.indexing.symbol_index import get_symbol_table
+
+router = APIRouter(tags=["symbols"])
+
+@router.get("/repos/{repo_id}/symbols")
+async def lookup_symbol(repo_id: str, name: str):
+    try:
+        rid = ObjectId(repo_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid repo_id")
+
+    table = await get_symbol_table(rid)
+    return {"repo_id": repo_id, "name": name, "matches": table.lookup(name)}
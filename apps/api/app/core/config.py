@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -19,11 +21,74 @@ class Settings(BaseSettings):
 
     GEMINI_CHAT_MODEL: str = "gemini-2.0-flash"
     CHAT_HISTORY_MAX_TURNS: int = 6
+    CHAT_SUMMARY_MAX_WORDS: int = 150
+
+    RETRIEVAL_MODE: str = "auto"  # auto | vector | hybrid
+    RRF_K: int = 60
+
+    EMBED_CACHE_SIZE: int = 2048
+    EMBED_CACHE_TTL_SECONDS: int = 24 * 3600
+    RETRIEVAL_CACHE_SIZE: int = 1024
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_SIZE: int = 512
+    ANSWER_CACHE_TTL_SECONDS: int = 6 * 3600
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    # answers to CANONICAL_QUESTIONS generated at ingest time, served instantly by /ask
+    PREGENERATE_ANSWERS: bool = False
+    CANONICAL_QUESTIONS: List[str] = [
+        "Where does ingestion start?",
+        "What are the entrypoints of this application?",
+        "Explain the architecture of this repository.",
+        "How does a question flow end to end, from the API to the answer?",
+    ]
+    CANONICAL_MATCH_SIMILARITY: float = 0.92
+    # indexed state / index generation per repo (refreshed locally on re-ingest)
+    REPO_STATUS_TTL_SECONDS: int = 10
+
+    BATCH_ASK_CONCURRENCY: int = 2
+
+    # LLM/embedding scheduler (app/services/llm/scheduler.py)
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_INTERACTIVE_CONCURRENCY: int = 4
+    LLM_BACKGROUND_CONCURRENCY: int = 1
+    LLM_BULK_CONCURRENCY: int = 2
+    LLM_MAX_QUEUE: int = 64
+    LLM_BULK_MAX_QUEUE: int = 512
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    LLM_BACKGROUND_QUEUE_TIMEOUT_SECONDS: float = 300.0
+
+    # estimated prompt tokens per provider (app/services/rag/packer.py);
+    # ollama fits a 4096-token context with room for the answer,
+    # local matches LocalT5LLM's 2048-token input truncation
+    PROMPT_TOKEN_BUDGETS: Dict[str, int] = {"gemini": 16000, "ollama": 3200, "local": 1900}
+
+    # provider circuit breakers (app/services/llm/router.py)
+    LLM_BREAKER_FAILURES: int = 3
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+
+    # deadline planning (app/services/rag/deadline.py): expected generation time
+    # per provider until the router has measured latencies of its own
+    LLM_EXPECTED_LATENCY_MS: Dict[str, int] = {"gemini": 4000, "ollama": 15000, "local": 8000}
+    DEADLINE_RETRIEVAL_MS: int = 400
+    DEADLINE_RERANK_MS: int = 500  # reranking is skipped when generation leaves less slack than this
 
     LLM_PROVIDER: str = "auto"  # auto | gemini | local | ollama
     LOCAL_LLM_MODEL: str = "google/flan-t5-base"
+    LOCAL_LLM_WARMUP: bool = False  # load at startup (background) when local is in the provider chain
+    LOCAL_LLM_QUANTIZE: bool = True  # dynamic int8 Linear layers on CPU
+    LOCAL_LLM_THREADS: int = 0  # torch threads on CPU; 0 = all cores
+    LOCAL_LLM_MAX_BATCH: int = 8
+    LOCAL_LLM_BATCH_WAIT_MS: int = 10
+    # optional CPU cross-encoder between retrieval and prompt packing (app/services/rag/reranker.py),
+    # e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty = off
+    RERANKER_MODEL: str = ""
+    RERANK_TOP_N: int = 4  # chunks kept for the prompt after reranking
+    RERANK_CACHE_SIZE: int = 8192
     OLLAMA_MODEL: str = "qwen2.5-coder:7b-instruct"
     OLLAMA_BASE_URL: str = "http://127.0.0.1:11434"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # keep the model (and session KV state) loaded between turns
+    OLLAMA_NUM_CTX: int = 8192  # context window requested per call (options.num_ctx); sessions continue in it
+    OLLAMA_ANSWER_TOKENS: int = 800  # kept free for the answer when a session's context is continued
     INGEST_TIMEOUT_MINUTES: int = 15
 
 settings = Settings()
\ No newline at end of file
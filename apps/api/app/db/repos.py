@@ -1,9 +1,24 @@
 from datetime import datetime
 from typing import Any, Dict, Optional
+from pymongo import ReturnDocument
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.db.mongo import get_db
 
 REPOS = "repos"
 INGEST_JOBS = "ingest_jobs"
+CODE_SYMBOLS = "code_symbols"
+CODE_GRAPHS = "code_graphs"
+REPO_ANALYSIS = "repo_analysis"
+CHAT_MESSAGES = "chat_messages"
+CANONICAL_ANSWERS = "canonical_answers"
+
+# str(repo_id) -> {"indexed": bool, "generation": int}; indexed repos only
+REPO_STATUS_CACHE = TTLCache(
+    "repo_status",
+    maxsize=4096,
+    ttl_seconds=settings.REPO_STATUS_TTL_SECONDS,
+)
 
 async def ensure_indexes():
     db = get_db()
@@ -11,6 +26,12 @@ async def ensure_indexes():
     await db[INGEST_JOBS].create_index("repo_id")
     await db[INGEST_JOBS].create_index("status")
     await db[INGEST_JOBS].create_index("created_at")
+    await db[CODE_SYMBOLS].create_index([("repo_id", 1), ("name_lower", 1)])
+    await db[CODE_SYMBOLS].create_index([("repo_id", 1), ("qualname_lower", 1)])
+    await db[CODE_GRAPHS].create_index("repo_id", unique=True)
+    await db[REPO_ANALYSIS].create_index([("repo_id", 1), ("generation", -1)], unique=True)
+    await db[CHAT_MESSAGES].create_index([("session_id", 1), ("created_at", -1)])
+    await db[CANONICAL_ANSWERS].create_index([("repo_id", 1), ("generation", -1)])
 
 async def create_repo(repo_url: str, canonical_repo_url: str,provider: str, default_branch: Optional[str] = None) -> Dict[str, Any]:
     db = get_db()
@@ -38,6 +59,61 @@ async def create_repo(repo_url: str, canonical_repo_url: str,provider: str, defa
 
     return await db[REPOS].find_one({"canonical_repo_url": canonical_repo_url})
 
+async def get_repo_status(repo_id) -> Dict[str, Any]:
+    """
+    Indexed state of a repo, from REPO_STATUS_CACHE when possible:
+    - indexed: ingestion has finished at least once (index_generation > 0,
+      or chunks exist for repos indexed before generations were tracked)
+    - generation: index generation (see get_index_generation)
+    Only indexed repos are cached. The worker running an ingest drops its
+    entry when the ingest starts and when the generation is bumped; other
+    workers can report the previous generation (and indexed=True while a
+    re-ingest rebuilds the chunks) for up to REPO_STATUS_TTL_SECONDS.
+    """
+    key = str(repo_id)
+    status = REPO_STATUS_CACHE.get(key)
+    if status is not None:
+        return status
+
+    db = get_db()
+    repo = await db[REPOS].find_one({"_id": repo_id}, {"index_generation": 1})
+    generation = int((repo or {}).get("index_generation") or 0)
+    indexed = generation > 0
+    if not indexed and repo is not None:
+        indexed = await db["code_chunks"].find_one({"repo_id": repo_id}, {"_id": 1}) is not None
+
+    status = {"indexed": indexed, "generation": generation}
+    if indexed:
+        REPO_STATUS_CACHE.set(key, status)
+    return status
+
+def invalidate_repo_status(repo_id) -> None:
+    REPO_STATUS_CACHE.invalidate(lambda key: key == str(repo_id))
+
+async def get_index_generation(repo_id) -> int:
+    """
+    Index generation of a repo: bumped every time ingestion finishes, so it
+    can key anything derived from the indexed chunks (caches, views).
+    """
+    return (await get_repo_status(repo_id))["generation"]
+
+async def bump_index_generation(repo_id) -> int:
+    db = get_db()
+    repo = await db[REPOS].find_one_and_update(
+        {"_id": repo_id},
+        {"$inc": {"index_generation": 1}, "$set": {"indexed_at": datetime.utcnow()}},
+        projection={"index_generation": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    invalidate_repo_status(repo_id)
+    return int((repo or {}).get("index_generation") or 0)
+
+async def get_indexed_job_id(repo_id):
+    """Ingest job whose chunks are currently indexed for the repo (None if not indexed)."""
+    db = get_db()
+    chunk = await db["code_chunks"].find_one({"repo_id": repo_id}, {"job_id": 1})
+    return (chunk or {}).get("job_id")
+
 async def create_ingest_job(repo_id, requested_by: str = "anonymous") -> Dict[str, Any]:
     db = get_db()
     job = {
@@ -1,7 +1,15 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.core.http import close_http_client
 from app.core.logging import setup_logging
 from app.db.repos import ensure_indexes
+from app.services.llm.registry import provider_module
+from app.services.llm.router import LLM_ROUTER, ProvidersUnavailableError
+from app.services.llm.scheduler import SchedulerSaturatedError
+from app.services.rag import reranker
 
 from app.api.v1.health import router as health_router
 from app.api.v1.ingest import router as ingest_router
@@ -13,6 +21,7 @@ from app.api.v1.repos import router as repos_router
 from app.api.v1.overview import router as overview_router
 from app.api.v1.entrypoints import router as entrypoints_router
 from app.api.v1.architecture import router as architecture_router
+from app.api.v1.symbols import router as symbols_router
 from app.api.v1.ui import router as ui_router
 
 logger = setup_logging()
@@ -24,6 +33,25 @@ def create_app() -> FastAPI:
     async def _startup():
         await ensure_indexes()
         logger.info("Indexes ensured")
+        if settings.LOCAL_LLM_WARMUP and "local" in LLM_ROUTER.chain():
+            # explicit opt-in (off by default): a fallback is only useful under
+            # load if it is already loaded. Don't block startup on the load
+            app.state.local_llm_warmup = asyncio.create_task(provider_module("local").warm_up())
+        if settings.RERANKER_MODEL:
+            app.state.reranker_warmup = asyncio.create_task(reranker.warm_up())
+
+    @app.exception_handler(SchedulerSaturatedError)
+    @app.exception_handler(ProvidersUnavailableError)
+    async def _saturated(request: Request, exc: SchedulerSaturatedError | ProvidersUnavailableError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    @app.on_event("shutdown")
+    async def _shutdown():
+        await close_http_client()
         
     app.include_router(ui_router, prefix="")
     app.include_router(health_router, prefix="/api/v1")
@@ -36,6 +64,7 @@ def create_app() -> FastAPI:
     app.include_router(overview_router, prefix="/api/v1")
     app.include_router(entrypoints_router, prefix="/api/v1")
     app.include_router(architecture_router, prefix="/api/v1")
+    app.include_router(symbols_router, prefix="/api/v1")
 
     return app
 
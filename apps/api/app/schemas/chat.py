@@ -5,8 +5,18 @@ class AskRequest(BaseModel):
     question: str = Field(..., min_length=2)
     session_id: Optional[str] = None
     top_k: int = 8
+    # latency target for /ask; the answer degrades (see AskResponse.degradations) to meet it
+    deadline_ms: Optional[int] = Field(None, ge=100)
 
 class AskResponse(BaseModel):
     session_id: str
     answer: str
-    sources: List[Dict[str, Any]]
\ No newline at end of file
+    sources: List[Dict[str, Any]]
+    cached: bool = False
+    prompt_usage: Optional[Dict[str, Any]] = None  # estimated tokens per prompt section
+    # applied to meet deadline_ms: provider:<name>, no_rerank, no_hints, top_k:<n>, truncated, deadline_exceeded
+    degradations: List[str] = Field(default_factory=list)
+
+class BatchAskRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=50)
+    top_k: int = 8
@@ -8,6 +8,7 @@ class Component(BaseModel):
 class RepoOverview(BaseModel):
     repo_id: str
     summary: str
+    summary_status: str = "ready"  # "pending" while generated in the background
     components: List[Component]
     data_flow: List[str]
     tech_stack: List[str]
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import ast
 import re
+from datetime import datetime
 from typing import Dict, List, Set
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 
 from app.db.mongo import get_db
 
@@ -84,54 +87,159 @@ def extract_entrypoints(chunks: List[dict]) -> Dict[str, List[dict]]:
 
 
 # -----------------------------
-# API-style route detection
+# Whole-file AST detection
 # -----------------------------
 
-async def detect_entrypoints(repo_id: ObjectId) -> List[str]:
+ENTRYPOINT_CACHE = "entrypoint_cache"
+REPO_FILE_CONTENTS = "repo_file_contents"
+
+# bump when detection logic changes so cached per-blob results are recomputed
+DETECTOR_VERSION = 2
+
+HTTP_METHODS = {"get", "post", "put", "delete", "patch", "head", "options", "api_route", "websocket"}
+SPAWN_CALLS = {"create_task", "ensure_future", "run_in_executor", "to_thread"}
+
+
+def _empty() -> Dict[str, List[dict]]:
+    return {"application": [], "api_routes": [], "background_jobs": []}
+
+
+def _callable_name(node: ast.AST) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Call):
+        return _callable_name(node.func)
+    return None
+
+
+class _EntrypointScan(ast.NodeVisitor):
+    def __init__(self) -> None:
+        self.found = _empty()
+        self._assign_target: str | None = None
+
+    def visit_Assign(self, node: ast.Assign):
+        target = node.targets[0]
+        self._assign_target = target.id if isinstance(target, ast.Name) else None
+        self.generic_visit(node)
+        self._assign_target = None
+
+    def _visit_def(self, node):
+        for dec in node.decorator_list:
+            if not (isinstance(dec, ast.Call) and isinstance(dec.func, ast.Attribute)):
+                continue
+            attr = dec.func.attr
+            first = dec.args[0] if dec.args else None
+            arg = first.value if isinstance(first, ast.Constant) and isinstance(first.value, str) else None
+            if attr in HTTP_METHODS:
+                self.found["api_routes"].append({
+                    "symbol": node.name,
+                    "method": "ANY" if attr == "api_route" else attr.upper(),
+                    "route": arg,
+                    "line": node.lineno,
+                    "description": "HTTP endpoint",
+                })
+            elif attr == "on_event":
+                self.found["application"].append({
+                    "symbol": node.name,
+                    "line": node.lineno,
+                    "description": f"{arg or 'lifecycle'} event handler",
+                })
+        self.generic_visit(node)
+
+    visit_FunctionDef = _visit_def
+    visit_AsyncFunctionDef = _visit_def
+
+    def visit_Call(self, node: ast.Call):
+        name = _callable_name(node.func)
+        if name == "FastAPI":
+            self.found["application"].append({
+                "symbol": f"{self._assign_target} = FastAPI()" if self._assign_target else "FastAPI()",
+                "line": node.lineno,
+                "description": "Application startup",
+            })
+        elif name == "add_task" and node.args:
+            self.found["background_jobs"].append({
+                "symbol": _callable_name(node.args[0]) or "background task",
+                "line": node.lineno,
+                "description": "BackgroundTasks.add_task",
+            })
+        elif name in SPAWN_CALLS and node.args:
+            target = node.args[-1] if name == "run_in_executor" else node.args[0]
+            self.found["background_jobs"].append({
+                "symbol": _callable_name(target) or "task",
+                "line": node.lineno,
+                "description": f"asyncio.{name}",
+            })
+        self.generic_visit(node)
+
+
+def detect_file_entrypoints(path: str, text: str) -> Dict[str, List[dict]]:
+    """
+    Entrypoints of one whole Python file (results carry no "file" key, so they
+    can be cached per blob SHA). Falls back to the regexes if it doesn't parse;
+    those items get the AST schema with the unknown fields (line, and a
+    route's method/route) set to None.
+    """
+    try:
+        tree = ast.parse(text)
+    except Exception:
+        found = extract_entrypoints([{"path": path, "text": text}])
+        for kind, items in found.items():
+            for item in items:
+                item.pop("file", None)
+                item.setdefault("line", None)
+                if kind == "api_routes":
+                    item.setdefault("method", None)
+                    item.setdefault("route", None)
+        return found
+    scan = _EntrypointScan()
+    scan.visit(tree)
+    return scan.found
+
+
+async def detect_repo_entrypoints(repo_id: ObjectId, job_id: ObjectId | None) -> Dict[str, List[dict]]:
+    """
+    Entrypoints across every Python file of an ingest job.
+    Per-file results are cached by blob SHA, so unchanged files are never
+    re-analyzed (or even downloaded from Mongo) on later ingests.
+    """
     db = get_db()
-    entrypoints: set[str] = set()
-
-    cursor = db["code_chunks"].find(
-        {
-            "repo_id": repo_id,
-            "path": {"$regex": "\\.py$", "$options": "i"},
-            "text": {"$regex": "@router\\.(get|post|put|delete)", "$options": "i"},
-        },
-        {"path": 1, "text": 1},
-    )
-
-    async for r in cursor:
-        text = r.get("text", "")
-
-        if "/ingest" in text or "ingest" in text:
-            entrypoints.add("POST /ingest")
-        if "/repos/{repo_id}/ask" in text or "/ask" in text or "ask_repo" in text:
-            entrypoints.add("POST /repos/{repo_id}/ask")
+    base = {"repo_id": repo_id, "job_id": job_id, "path": {"$regex": "\\.py$", "$options": "i"}}
+    manifest = await db[REPO_FILE_CONTENTS].find(base, {"_id": 0, "path": 1, "sha": 1}).to_list(length=None)
 
-    return sorted(entrypoints)
-
-# -----------------------------
-# Call-graph walking (used by /architecture)
-# -----------------------------
+    keys = {f"{DETECTOR_VERSION}:{m.get('sha')}" for m in manifest if m.get("sha")}
+    cached = {
+        d["_id"]: d["result"]
+        async for d in db[ENTRYPOINT_CACHE].find({"_id": {"$in": list(keys)}})
+    }
 
-def walk_graph(
-    graph: Dict[str, Set[str]],
-    start: str,
-    max_depth: int = 6,
-) -> List[str]:
-    """
-    Walk a call graph safely with depth control.
-    """
-    path: List[str] = []
-    visited: Set[str] = set()
-
-    def dfs(node: str, depth: int):
-        if depth > max_depth or node in visited:
-            return
-        visited.add(node)
-        path.append(node)
-        for child in graph.get(node, []):
-            dfs(child, depth + 1)
-
-    dfs(start, 0)
-    return path
\ No newline at end of file
+    missing_shas = [
+        m["sha"] for m in manifest
+        if m.get("sha") and f"{DETECTOR_VERSION}:{m['sha']}" not in cached
+    ]
+    fresh: List[dict] = []
+    if missing_shas:
+        cursor = db[REPO_FILE_CONTENTS].find(
+            {**base, "sha": {"$in": missing_shas}},
+            {"_id": 0, "path": 1, "sha": 1, "text": 1},
+        )
+        async for f in cursor:
+            key = f"{DETECTOR_VERSION}:{f['sha']}"
+            if key in cached:
+                continue  # same blob at two paths
+            cached[key] = detect_file_entrypoints(f["path"], f.get("text") or "")
+            fresh.append({"_id": key, "result": cached[key], "created_at": datetime.utcnow()})
+    if fresh:
+        try:
+            await db[ENTRYPOINT_CACHE].insert_many(fresh, ordered=False)
+        except BulkWriteError:
+            pass  # another ingest cached the same blob first
+
+    entrypoints = _empty()
+    for m in sorted(manifest, key=lambda m: m["path"]):
+        result = cached.get(f"{DETECTOR_VERSION}:{m.get('sha')}") or _empty()
+        for kind, items in result.items():
+            entrypoints[kind].extend({"file": m["path"], **item} for item in items)
+    return entrypoints
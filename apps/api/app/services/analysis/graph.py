@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from loguru import logger
+
+from app.core.cache import TTLCache
+from app.db.mongo import get_db
+from app.db.repos import CODE_GRAPHS, get_index_generation, get_indexed_job_id
+from app.services.rag.links import NOISE_ATTRS, NOISE_CALLS
+
+REPO_FILE_CONTENTS = "repo_file_contents"
+
+EDGE_CALL = 0
+EDGE_IMPORT = 1
+
+# stay under MongoDB's 16MB document limit with room for the other fields
+MAX_GRAPH_DOC_BYTES = 15 * 1024 * 1024
+
+# (repo_id, index generation) -> CodeGraph
+_GRAPHS = TTLCache("code_graphs", maxsize=32, ttl_seconds=3600)
+
+
+@dataclass
+class CodeGraph:
+    """
+    Symbol-level call/import graph in CSR form.
+    - nodes[i]: {"qualname", "name", "kind", "path", "line"}
+    - successors of node i: indices[indptr[i]:indptr[i + 1]]
+    - edge_kinds is parallel to indices (EDGE_CALL | EDGE_IMPORT)
+    """
+    nodes: List[Dict[str, Any]]
+    indptr: List[int]
+    indices: List[int]
+    edge_kinds: List[int]
+
+    def successors(self, i: int, kind: Optional[int] = None) -> List[int]:
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        if kind is None:
+            return self.indices[lo:hi]
+        return [self.indices[j] for j in range(lo, hi) if self.edge_kinds[j] == kind]
+
+    def find(self, name: str) -> List[int]:
+        """Node ids whose simple or qualified name matches."""
+        return [i for i, n in enumerate(self.nodes) if name in (n["name"], n["qualname"])]
+
+    def walk(self, start: int, max_depth: int = 6, kind: Optional[int] = EDGE_CALL) -> Dict[str, Any]:
+        """
+        Breadth-first multi-hop traversal from a node.
+        Returns visited qualnames (BFS order) and the edges followed.
+        """
+        order = [start]
+        seen = {start}
+        edges: List[Tuple[str, str]] = []
+        frontier = [start]
+        for _ in range(max_depth):
+            nxt: List[int] = []
+            for u in frontier:
+                for v in self.successors(u, kind):
+                    edges.append((self.nodes[u]["qualname"], self.nodes[v]["qualname"]))
+                    if v not in seen:
+                        seen.add(v)
+                        order.append(v)
+                        nxt.append(v)
+            if not nxt:
+                break
+            frontier = nxt
+        return {"path": [self.nodes[i]["qualname"] for i in order], "edges": edges}
+
+    def to_doc(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "edge_kinds": self.edge_kinds,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "CodeGraph":
+        return cls(
+            nodes=doc.get("nodes") or [],
+            indptr=doc.get("indptr") or [0],
+            indices=doc.get("indices") or [],
+            edge_kinds=doc.get("edge_kinds") or [],
+        )
+
+
+def _module_name(path: str) -> str:
+    return path[:-3].replace("/", ".").removesuffix(".__init__")
+
+
+def _call_target(node: ast.Call) -> Optional[Tuple[Optional[str], str]]:
+    """
+    (receiver, name) of a call: `foo()` -> (None, "foo"), `x.foo()` -> ("x", "foo").
+    Receivers that aren't plain names (`a.b.foo()`, `f().foo()`) come back as "?".
+    """
+    fn = node.func
+    if isinstance(fn, ast.Name) and fn.id not in NOISE_CALLS:
+        return None, fn.id
+    if isinstance(fn, ast.Attribute) and fn.attr not in NOISE_ATTRS:
+        receiver = fn.value.id if isinstance(fn.value, ast.Name) else "?"
+        return receiver, fn.attr
+    return None
+
+
+class _FileScan(ast.NodeVisitor):
+    """Collects definitions, per-function call names and imports for one module."""
+
+    def __init__(self) -> None:
+        # {"qualname", "name", "kind", "line", "calls": [(receiver, name), ...]}
+        self.defs: List[Dict[str, Any]] = []
+        self.imports: List[Tuple[str, Optional[str], str]] = []  # (module, symbol, local name)
+        self._scope: List[str] = []
+        self._in_class: List[bool] = [False]
+
+    def _visit_def(self, node, kind: str) -> None:
+        qualname = ".".join([*self._scope, node.name])
+        calls: List[Tuple[Optional[str], str]] = []
+        if kind != "class":
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Call):
+                    target = _call_target(sub)
+                    if target and target not in calls:
+                        calls.append(target)
+        self.defs.append({
+            "qualname": qualname,
+            "name": node.name,
+            "kind": kind,
+            "line": getattr(node, "lineno", 0) or 0,
+            "calls": calls,
+        })
+        self._scope.append(node.name)
+        self._in_class.append(kind == "class")
+        self.generic_visit(node)
+        self._scope.pop()
+        self._in_class.pop()
+
+    def visit_FunctionDef(self, node):
+        self._visit_def(node, "method" if self._in_class[-1] else "function")
+
+    def visit_AsyncFunctionDef(self, node):
+        self._visit_def(node, "method" if self._in_class[-1] else "function")
+
+    def visit_ClassDef(self, node):
+        self._visit_def(node, "class")
+
+    def visit_Import(self, node):
+        for a in node.names:
+            self.imports.append((a.name, None, a.asname or a.name.split(".")[0]))
+
+    def visit_ImportFrom(self, node):
+        mod = node.module or ""
+        for a in node.names:
+            self.imports.append((mod, a.name, a.asname or a.name))
+
+
+def build_code_graph(files: List[Dict[str, Any]]) -> CodeGraph:
+    """
+    Resolve a repo-wide call/import graph from full Python file contents.
+    Call resolution for `name()` inside a function:
+    1. a name imported into the module (from x import name)
+    2. a definition in the same module
+    3. the only definition with that name anywhere in the repo
+    `self.name()` resolves within the module, `mod.name()` / `Cls.name()` within
+    the imported module; calls on other receivers are left unresolved.
+    """
+    scans: Dict[str, _FileScan] = {}
+    for f in files:
+        path = f.get("path") or ""
+        if not path.lower().endswith(".py"):
+            continue
+        try:
+            tree = ast.parse(f.get("text") or "")
+        except Exception:
+            continue
+        scan = _FileScan()
+        scan.visit(tree)
+        scans[path] = scan
+
+    nodes: List[Dict[str, Any]] = []
+    module_node: Dict[str, int] = {}
+    def_nodes: Dict[str, List[int]] = {}
+    by_path_name: Dict[Tuple[str, str], List[int]] = {}
+    by_name: Dict[str, List[int]] = {}
+    suffix_to_path: Dict[str, str] = {}
+
+    for path, scan in scans.items():
+        module = _module_name(path)
+        module_node[path] = len(nodes)
+        nodes.append({
+            "qualname": module,
+            "name": module.rsplit(".", 1)[-1],
+            "kind": "module",
+            "path": path,
+            "line": 1,
+        })
+        parts = module.split(".")
+        for i in range(len(parts)):
+            suffix_to_path.setdefault(".".join(parts[i:]), path)
+        for d in scan.defs:
+            idx = len(nodes)
+            nodes.append({
+                "qualname": f"{module}.{d['qualname']}",
+                "name": d["name"],
+                "kind": d["kind"],
+                "path": path,
+                "line": d["line"],
+            })
+            def_nodes.setdefault(path, []).append(idx)
+            by_path_name.setdefault((path, d["name"]), []).append(idx)
+            by_name.setdefault(d["name"], []).append(idx)
+
+    adjacency: List[Dict[int, int]] = [dict() for _ in nodes]
+
+    for path, scan in scans.items():
+        imported_defs: Dict[str, List[int]] = {}  # local name -> definition nodes
+        imported_paths: Dict[str, str] = {}  # local name -> module (or defining module) path
+        for mod, symbol, local in scan.imports:
+            submodule = suffix_to_path.get(f"{mod}.{symbol}") if symbol else None
+            target_path = submodule or suffix_to_path.get(mod)
+            if target_path is None:
+                continue
+            adjacency[module_node[path]].setdefault(module_node[target_path], EDGE_IMPORT)
+            imported_paths[local] = target_path
+            if symbol is not None and submodule is None:
+                imported_defs[local] = by_path_name.get((target_path, symbol), [])
+
+        for d, idx in zip(scan.defs, def_nodes.get(path, [])):
+            for receiver, name in d["calls"]:
+                if receiver is None:
+                    targets = imported_defs.get(name) or by_path_name.get((path, name))
+                    if not targets and len(by_name.get(name, [])) == 1:
+                        targets = by_name[name]
+                elif receiver in ("self", "cls"):
+                    targets = by_path_name.get((path, name))
+                elif receiver in imported_paths:
+                    targets = by_path_name.get((imported_paths[receiver], name))
+                else:
+                    targets = None
+                for t in targets or []:
+                    if t != idx:
+                        adjacency[idx].setdefault(t, EDGE_CALL)
+
+    indptr = [0]
+    indices: List[int] = []
+    edge_kinds: List[int] = []
+    for succ in adjacency:
+        for v in sorted(succ):
+            indices.append(v)
+            edge_kinds.append(succ[v])
+        indptr.append(len(indices))
+
+    return CodeGraph(nodes=nodes, indptr=indptr, indices=indices, edge_kinds=edge_kinds)
+
+
+async def _save_graph(repo_id: ObjectId, job_id: ObjectId, graph: CodeGraph) -> bool:
+    """
+    Persist the graph as one document. A graph too big for that isn't stored
+    (and the previous one is dropped): readers rebuild it from file contents.
+    """
+    db = get_db()
+    doc = {"repo_id": repo_id, "job_id": job_id, **graph.to_doc(), "created_at": datetime.utcnow()}
+    size = len(bson.encode(doc))
+    if size > MAX_GRAPH_DOC_BYTES:
+        logger.warning(
+            "code graph for repo {} is {} bytes ({} nodes, {} edges), over the document limit; not persisted",
+            repo_id, size, len(graph.nodes), len(graph.indices),
+        )
+        await db[CODE_GRAPHS].delete_one({"repo_id": repo_id})
+        return False
+    await db[CODE_GRAPHS].replace_one({"repo_id": repo_id}, doc, upsert=True)
+    return True
+
+
+async def build_graph_for_job(repo_id: ObjectId, job_id: ObjectId, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the repo's code graph once per ingest and persist it (one doc per repo)."""
+    graph = build_code_graph(files)
+    persisted = await _save_graph(repo_id, job_id, graph)
+    return {"graph_nodes": len(graph.nodes), "graph_edges": len(graph.indices), "graph_persisted": persisted}
+
+
+async def get_code_graph(repo_id: ObjectId) -> CodeGraph:
+    """
+    Persisted graph for the repo's current index generation.
+    Repos indexed before graphs existed get one built from their latest file contents.
+    """
+    generation = await get_index_generation(repo_id)
+    key = (str(repo_id), generation)
+    graph = _GRAPHS.get(key)
+    if graph is not None:
+        return graph
+
+    db = get_db()
+    doc = await db[CODE_GRAPHS].find_one({"repo_id": repo_id}, {"_id": 0, "repo_id": 0, "job_id": 0})
+    if doc is not None:
+        graph = CodeGraph.from_doc(doc)
+    else:
+        job_id = await get_indexed_job_id(repo_id)
+        files = await db[REPO_FILE_CONTENTS].find(
+            {"repo_id": repo_id, "job_id": job_id, "path": {"$regex": "\\.py$", "$options": "i"}},
+            {"path": 1, "text": 1},
+        ).to_list(length=None)
+        graph = build_code_graph(files)
+        await _save_graph(repo_id, job_id, graph)
+
+    _GRAPHS.set(key, graph)
+    return graph
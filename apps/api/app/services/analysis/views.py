@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from bson import ObjectId
+from loguru import logger
+
+from app.db.mongo import get_db
+from app.db.repos import REPO_ANALYSIS, get_indexed_job_id, get_repo_status
+from app.services.analysis.architecture import build_architecture
+from app.services.analysis.entrypoints import detect_repo_entrypoints
+from app.services.llm.scheduler import LLM_SCHEDULER, Priority
+from app.services.overview.builder import build_overview
+from app.services.overview.summary import generate_summary
+
+DATA_FLOW = [
+    "GitHub repository → file tree → chunks",
+    "Chunks → embeddings → vector index",
+    "Query → retrieval → answer",
+]
+
+# one background summarization per (repo, generation) at a time
+_SUMMARY_TASKS: Dict[Tuple[ObjectId, int], asyncio.Task] = {}
+
+
+async def _summarize(overview: Dict[str, Any]) -> Optional[str]:
+    try:
+        async with LLM_SCHEDULER.slot(Priority.BACKGROUND):
+            return await generate_summary(
+                components=overview["components"],
+                tech_stack=overview["tech_stack"],
+            )
+    except Exception as exc:
+        logger.warning("overview summary failed: {}", exc)
+        return None
+
+
+async def _overview_base(repo_id: ObjectId) -> Dict[str, Any]:
+    base = await build_overview(repo_id)
+    return {**base, "data_flow": DATA_FLOW, "summary": None}
+
+
+async def compute_overview(repo_id: ObjectId) -> Dict[str, Any]:
+    view = await _overview_base(repo_id)
+    if view["components"]:
+        view["summary"] = await _summarize(view)
+    return view
+
+
+async def compute_entrypoints(repo_id: ObjectId) -> Dict[str, Any]:
+    entrypoints = await detect_repo_entrypoints(repo_id, await get_indexed_job_id(repo_id))
+    return {
+        "framework": "FastAPI",
+        "entrypoints": entrypoints,
+        "confidence": "high" if entrypoints["application"] else "medium",
+    }
+
+
+async def compute_architecture(repo_id: ObjectId) -> Dict[str, Any]:
+    return {"flows": await build_architecture(repo_id)}
+
+
+VIEWS: Dict[str, Callable[[ObjectId], Awaitable[Dict[str, Any]]]] = {
+    "overview": compute_overview,
+    "entrypoints": compute_entrypoints,
+    "architecture": compute_architecture,
+}
+
+
+async def _store_view(repo_id: ObjectId, generation: int, name: str, view: Dict[str, Any]) -> None:
+    db = get_db()
+    await db[REPO_ANALYSIS].update_one(
+        {"repo_id": repo_id, "generation": generation},
+        {"$set": {name: view, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def materialize_analysis(repo_id: ObjectId, generation: int) -> Dict[str, Any]:
+    """
+    Final ingestion stage: compute every analysis view (incl. the LLM summary)
+    once and store them as one versioned document per index generation.
+    """
+    db = get_db()
+    # the generation's doc exists even if every view fails, so readers never
+    # fall back to a previous generation's views
+    await db[REPO_ANALYSIS].update_one(
+        {"repo_id": repo_id, "generation": generation},
+        {"$setOnInsert": {"created_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+    stored = []
+    for name, compute in VIEWS.items():
+        try:
+            view = await compute(repo_id)
+        except Exception as exc:
+            # the endpoint computes it lazily instead
+            logger.warning("materializing {} failed: {}", name, exc)
+            continue
+        await _store_view(repo_id, generation, name, view)
+        stored.append(name)
+    return {"analysis_views": stored}
+
+
+async def _fill_summary(repo_id: ObjectId, generation: int, overview: Dict[str, Any]) -> None:
+    summary = await _summarize(overview)
+    if summary:
+        db = get_db()
+        await db[REPO_ANALYSIS].update_one(
+            {"repo_id": repo_id, "generation": generation},
+            {"$set": {"overview.summary": summary, "updated_at": datetime.utcnow()}},
+        )
+
+
+def _schedule_summary(repo_id: ObjectId, generation: int, overview: Dict[str, Any]) -> None:
+    key = (repo_id, generation)
+    if key in _SUMMARY_TASKS:
+        return
+    task = asyncio.create_task(_fill_summary(repo_id, generation, overview))
+    _SUMMARY_TASKS[key] = task
+
+    def _done(t: asyncio.Task) -> None:
+        _SUMMARY_TASKS.pop(key, None)
+        if not t.cancelled() and t.exception():
+            logger.warning("background overview summary failed: {}", t.exception())
+
+    task.add_done_callback(_done)
+
+
+async def get_analysis_view(repo_id: ObjectId, name: str) -> Optional[Dict[str, Any]]:
+    """
+    One indexed read for the newest generation's view. Views missing from it
+    (repos indexed before views existed, failed materialization) are computed
+    once here and stored. A missing overview summary is never generated on
+    the read path: the view comes back with summary_status "pending" while
+    one background task per repo generation retries it.
+    None for repos that aren't indexed: nothing is computed or stored for them.
+    """
+    db = get_db()
+    doc = await db[REPO_ANALYSIS].find_one(
+        {"repo_id": repo_id},
+        {name: 1, "generation": 1},
+        sort=[("generation", -1)],
+    )
+    if doc is not None:
+        generation = doc["generation"]
+    else:
+        status = await get_repo_status(repo_id)
+        if not status["indexed"]:
+            return None
+        generation = status["generation"]
+
+    view: Optional[Dict[str, Any]] = (doc or {}).get(name)
+    dirty = view is None
+    if view is None:
+        compute = _overview_base if name == "overview" else VIEWS[name]
+        view = await compute(repo_id)
+
+    if name == "overview" and not view["components"]:
+        return view  # not indexed; nothing worth storing
+
+    if dirty:
+        await _store_view(repo_id, generation, name, view)
+
+    if name == "overview" and not view.get("summary"):
+        _schedule_summary(repo_id, generation, view)
+        return {**view, "summary_status": "pending"}
+    return view
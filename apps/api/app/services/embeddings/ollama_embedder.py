@@ -1,18 +1,28 @@
-import httpx
-
 from app.core.config import settings
+from app.core.http import get_http_client
 
 class OllamaEmbedder:
     def __init__(self, model: str | None = None, base_url: str | None = None):
         self.model = model or settings.OLLAMA_EMBED_MODEL
         base = (base_url or settings.OLLAMA_BASE_URL).rstrip("/")
         self.url = f"{base}/api/embeddings"
+        self.batch_url = f"{base}/api/embed"
 
-    def embed_text(self, text: str) -> list[float]:
-        r = httpx.post(
+    async def embed_text(self, text: str) -> list[float]:
+        r = await get_http_client().post(
             self.url,
             json={"model": self.model, "prompt": text},
             timeout=60,
         )
         r.raise_for_status()
         return r.json()["embedding"]
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts in one request (Ollama /api/embed)."""
+        r = await get_http_client().post(
+            self.batch_url,
+            json={"model": self.model, "input": texts},
+            timeout=120,
+        )
+        r.raise_for_status()
+        return r.json()["embeddings"]
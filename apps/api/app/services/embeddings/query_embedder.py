@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import List
+
+from app.core.cache import SingleFlight
+from app.services.embeddings.ollama_embedder import OllamaEmbedder
+from app.services.llm.scheduler import LLM_SCHEDULER, Priority
+from app.services.retrieval.cache import EMBEDDING_CACHE, normalize_question
+
+_embedder: OllamaEmbedder | None = None
+_INFLIGHT = SingleFlight()
+
+
+def get_embedder() -> OllamaEmbedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = OllamaEmbedder()
+    return _embedder
+
+
+async def embed_query(question: str, priority: Priority = Priority.INTERACTIVE) -> List[float]:
+    """
+    Embed a user question, served from EMBEDDING_CACHE when possible;
+    concurrent calls for the same question share one model call.
+    priority: LLM_SCHEDULER class of the caller (batch / ingest work must not
+    queue ahead of interactive questions).
+    """
+    embedder = get_embedder()
+    key = (embedder.model, normalize_question(question))
+    vec = EMBEDDING_CACHE.get(key)
+    if vec is not None:
+        return vec
+
+    async def embed() -> List[float]:
+        async with LLM_SCHEDULER.slot(priority):
+            fresh = await embedder.embed_text(question)
+        EMBEDDING_CACHE.set(key, fresh)
+        return fresh
+
+    return await _INFLIGHT.run(key, embed)
+
+
+async def embed_queries(questions: List[str], priority: Priority = Priority.BULK) -> List[List[float]]:
+    """
+    Embed many questions with one batched model call (cache misses only),
+    priming EMBEDDING_CACHE so later embed_query calls are hits.
+    """
+    embedder = get_embedder()
+    keys = [(embedder.model, normalize_question(q)) for q in questions]
+    vecs = [EMBEDDING_CACHE.get(key) for key in keys]
+
+    missing = list({keys[i]: questions[i] for i, v in enumerate(vecs) if v is None}.items())
+    if missing:
+        async with LLM_SCHEDULER.slot(priority):
+            fresh_vecs = await embedder.embed_texts([q for _, q in missing])
+        fresh = {key: vec for (key, _), vec in zip(missing, fresh_vecs)}
+        for key, vec in fresh.items():
+            EMBEDDING_CACHE.set(key, vec)
+        vecs = [v if v is not None else fresh[key] for v, key in zip(vecs, keys)]
+    return vecs
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List
+
+TOKEN_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_./-]{1,}")
+PART_SPLIT_RE = re.compile(r"[_./-]+")
+
+
+def text_terms(text: str) -> List[str]:
+    """
+    Lowercased term set for a chunk:
+    - whole tokens (`ingest_repo`, `app/services/rag`)
+    - plus their parts (`ingest`, `repo`, `services`, ...)
+    Lets retrieval rank candidates without pulling chunk text: a keyword
+    found inside the text is found inside one of its whole tokens.
+    """
+    terms: set[str] = set()
+    for token in TOKEN_RE.findall(text.lower()):
+        terms.add(token)
+        for part in PART_SPLIT_RE.split(token):
+            if len(part) >= 2:
+                terms.add(part)
+    return sorted(terms)
+
+
+def chunk_features(text: str) -> Dict[str, Any]:
+    """Lightweight per-chunk features stored next to the chunk at index time."""
+    return {
+        "text_len": len(text.strip()),
+        "terms": text_terms(text),
+    }
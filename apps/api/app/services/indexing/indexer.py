@@ -9,6 +9,10 @@ from bson import ObjectId
 from app.db.mongo import get_db
 from app.services.embeddings.ollama_embedder import OllamaEmbedder
 from app.services.indexing.chunker import chunk_text_by_lines
+from app.services.llm.scheduler import LLM_SCHEDULER, Priority
+from app.services.indexing.features import chunk_features
+from app.services.indexing.symbol_index import build_symbol_index
+from app.services.analysis.graph import build_graph_for_job
 
 REPO_FILE_CONTENTS = "repo_file_contents"
 CODE_CHUNKS = "code_chunks"
@@ -57,7 +61,9 @@ async def build_embeddings_for_job(repo_id: ObjectId, job_id: ObjectId) -> Dict[
             # (keeps embeddings aware of file context)
             embed_input = f"FILE: {path}\nLINES: {ch.start_line}-{ch.end_line}\n\n{ch.text}"
 
-            vec = embedder.embed_text(embed_input)
+            # one slot per chunk so interactive traffic can interleave with ingest
+            async with LLM_SCHEDULER.slot(Priority.BULK):
+                vec = await embedder.embed_text(embed_input)
 
             doc = {
                 "repo_id": repo_id,
@@ -67,6 +73,7 @@ async def build_embeddings_for_job(repo_id: ObjectId, job_id: ObjectId) -> Dict[
                 "start_line": ch.start_line,
                 "end_line": ch.end_line,
                 "text": ch.text,
+                **chunk_features(ch.text),
                 "embedding": vec,
                 "text_hash": _sha1(embed_input),
                 "created_at": datetime.utcnow(),
@@ -86,6 +93,14 @@ async def build_embeddings_for_job(repo_id: ObjectId, job_id: ObjectId) -> Dict[
     if batch:
         await db[CODE_CHUNKS].insert_many(batch)
 
-    stats = {"chunk_count": total_chunks, "embedded_chunks": total_embedded}
+    symbol_stats = await build_symbol_index(repo_id, job_id, files)
+    graph_stats = await build_graph_for_job(repo_id, job_id, files)
+
+    stats = {
+        "chunk_count": total_chunks,
+        "embedded_chunks": total_embedded,
+        **symbol_stats,
+        **graph_stats,
+    }
     await _set_job(job_id, {"stats": {**(await db[INGEST_JOBS].find_one({"_id": job_id}, {"stats": 1}) or {}).get("stats", {}), **stats}})
     return stats
\ No newline at end of file
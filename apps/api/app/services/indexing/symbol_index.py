@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List
+
+from bson import ObjectId
+
+from app.core.cache import TTLCache
+from app.db.mongo import get_db
+from app.db.repos import CODE_SYMBOLS, get_index_generation
+from app.services.rag.symbols import extract_python_symbols
+
+# (repo_id, index generation) -> SymbolTable
+_TABLES = TTLCache("symbol_tables", maxsize=32, ttl_seconds=3600)
+
+
+def file_symbol_docs(repo_id: ObjectId, job_id: ObjectId, path: str, text: str) -> List[Dict[str, Any]]:
+    if not path.lower().endswith(".py"):
+        return []
+    docs = []
+    for hit in extract_python_symbols(text):
+        qualname = hit.qualname or hit.name
+        docs.append({
+            "repo_id": repo_id,
+            "job_id": job_id,
+            "name": hit.name,
+            "name_lower": hit.name.lower(),
+            "qualname": qualname,
+            "qualname_lower": qualname.lower(),
+            "kind": hit.kind,
+            "path": path,
+            "start_line": hit.lineno,
+            "end_line": hit.end_lineno or hit.lineno,
+        })
+    return docs
+
+
+async def build_symbol_index(repo_id: ObjectId, job_id: ObjectId, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Rebuild the repo's symbol table from full file contents.
+    Parsing whole files (not chunks) gives exact qualified names and line spans.
+    """
+    db = get_db()
+    await db[CODE_SYMBOLS].delete_many({"repo_id": repo_id})
+
+    docs: List[Dict[str, Any]] = []
+    now = datetime.utcnow()
+    for f in files:
+        for d in file_symbol_docs(repo_id, job_id, f.get("path") or "", f.get("text") or ""):
+            d["created_at"] = now
+            docs.append(d)
+
+    if docs:
+        await db[CODE_SYMBOLS].insert_many(docs)
+    return {"symbols_indexed": len(docs)}
+
+
+@dataclass
+class SymbolTable:
+    by_name: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    by_qualname: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+    def lookup(self, name: str) -> List[Dict[str, Any]]:
+        """Exact lookup by simple name (`get_tree`) or qualified name (`GitHubClient.get_tree`)."""
+        key = name.strip().strip("`").removesuffix("()").lower()
+        if "." in key:
+            return self.by_qualname.get(key, [])
+        return self.by_name.get(key, [])
+
+
+async def get_symbol_table(repo_id: ObjectId) -> SymbolTable:
+    """In-process symbol table for the repo's current index generation."""
+    generation = await get_index_generation(repo_id)
+    key = (str(repo_id), generation)
+    table = _TABLES.get(key)
+    if table is not None:
+        return table
+
+    db = get_db()
+    table = SymbolTable()
+    cursor = db[CODE_SYMBOLS].find(
+        {"repo_id": repo_id},
+        {"_id": 0, "name": 1, "qualname": 1, "kind": 1, "path": 1, "start_line": 1, "end_line": 1},
+    )
+    async for d in cursor:
+        table.by_name.setdefault(d["name"].lower(), []).append(d)
+        table.by_qualname.setdefault(d["qualname"].lower(), []).append(d)
+
+    _TABLES.set(key, table)
+    return table
@@ -3,10 +3,18 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Any, Dict, List
 
+from loguru import logger
+
+from app.core.config import settings
 from app.db.mongo import get_db
 from app.services.ingestion.github_client import GitHubClient, GitHubAPIError
 from app.utils.repo_url import parse_github_owner_repo
 from app.services.indexing.indexer import build_embeddings_for_job
+from app.db.repos import bump_index_generation, invalidate_repo_status
+from app.services.retrieval.cache import invalidate_repo
+from app.services.rag.answer_cache import ANSWER_CACHE
+from app.services.analysis.views import materialize_analysis
+from app.services.rag.canonical import pregenerate_answers
 
 REPO_FILES = "repo_files"
 INGEST_JOBS = "ingest_jobs"
@@ -30,6 +38,7 @@ async def ingest_github_file_tree(repo_doc: Dict[str, Any], job_doc: Dict[str, A
     job_id = job_doc["_id"]
 
     await _set_job(job_id, "running")
+    invalidate_repo_status(repo_doc["_id"])  # chunks are about to be replaced
 
     try:
         owner, repo = parse_github_owner_repo(repo_doc["canonical_repo_url"])
@@ -77,8 +86,28 @@ async def ingest_github_file_tree(repo_doc: Dict[str, Any], job_doc: Dict[str, A
 
         emb_stats = await build_embeddings_for_job(repo_doc["_id"], job_id)
 
-        await _set_job(job_id, "done", extra={"stats": {"files_indexed": len(files), **content_stats, **emb_stats}})
-        return {"default_branch": default_branch, "files_indexed": len(files), **content_stats, **emb_stats}
+        # new index generation -> cached retrieval results become unreachable
+        generation = await bump_index_generation(repo_doc["_id"])
+        invalidate_repo(repo_doc["_id"])
+        ANSWER_CACHE.invalidate_repo(repo_doc["_id"])
+
+        # overview / entrypoints / architecture are served from these views
+        view_stats = await materialize_analysis(repo_doc["_id"], generation)
+
+        stats = {"files_indexed": len(files), **content_stats, **emb_stats, **view_stats}
+        await _set_job(job_id, "done", extra={"stats": stats})
+
+        # after "done": the repo is askable meanwhile, matching answers start
+        # being served instantly once they are stored
+        if settings.PREGENERATE_ANSWERS:
+            try:
+                canonical_stats = await pregenerate_answers(repo_doc["_id"], generation)
+            except Exception as exc:
+                logger.warning("pregenerating canonical answers failed: {}", exc)
+            else:
+                stats.update(canonical_stats)
+                await _set_job(job_id, "done", extra={"stats": stats})
+        return {"default_branch": default_branch, **stats}
 
     except (GitHubAPIError, ValueError) as e:
         await _set_job(job_id, "failed", error=str(e))
@@ -0,0 +1,2 @@
+class LLMRateLimitError(Exception):
+    pass
@@ -1,13 +1,17 @@
 from __future__ import annotations
+from functools import lru_cache
 from typing import Optional
 from google import genai
 from google.genai.errors import ClientError
 
 from app.core.config import settings
+from app.services.llm.errors import LLMRateLimitError
 
 
-class LLMRateLimitError(Exception):
-    pass
+@lru_cache(maxsize=4)
+def get_genai_client(api_key: str) -> genai.Client:
+    # one client (and connection pool) per key instead of one per request
+    return genai.Client(api_key=api_key)
 
 
 class GeminiChatLLM:
@@ -15,15 +19,15 @@ class GeminiChatLLM:
         key = api_key or settings.GEMINI_API_KEY
         if not key:
             raise RuntimeError("GEMINI_API_KEY is not set")
-        self.client = genai.Client(api_key=key)
+        self.client = get_genai_client(key)
         self.model = model or settings.GEMINI_CHAT_MODEL
 
-    def generate(self, prompt: str) -> str:
+    async def generate(self, prompt: str) -> str:
         try:
-            res = self.client.models.generate_content(model=self.model, contents=prompt)
+            res = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
             return (res.text or "").strip()
         except ClientError as e:
             # 429 quota/rate-limit
             if getattr(e, "status_code", None) == 429:
                 raise LLMRateLimitError(str(e)) from e
-            raise
\ No newline at end of file
+            raise
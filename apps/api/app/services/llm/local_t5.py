@@ -1,39 +1,178 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
+from typing import List, Optional
 
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from loguru import logger
 
 from app.core.config import settings
 
+# torch / transformers are imported inside the functions that need them, so
+# importing this module (registry, tests, warm-up scheduling) stays cheap
+
+MAX_INPUT_TOKENS = 2048
+
 
 def _pick_device() -> str:
-    # Apple Silicon (MPS) if available, else CPU
+    import torch
+
+    # CUDA, then Apple Silicon (MPS), else CPU
+    if torch.cuda.is_available():
+        return "cuda"
     if torch.backends.mps.is_available():
         return "mps"
     return "cpu"
 
 
+def _quantize(model):
+    """Dynamic int8 for the Linear layers (CPU only); falls back to fp32."""
+    import torch
+
+    if not torch.backends.quantized.supported_engines or torch.backends.quantized.supported_engines == ["none"]:
+        return model
+    try:
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    except Exception as exc:
+        logger.warning("int8 quantization unavailable, using fp32: {}", exc)
+        return model
+
+
 @lru_cache(maxsize=1)
 def _load_model():
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    started = time.monotonic()
     model_name = settings.LOCAL_LLM_MODEL
+    device = _pick_device()
+    if device == "cpu":
+        torch.set_num_threads(settings.LOCAL_LLM_THREADS or os.cpu_count() or 1)
+
     tok = AutoTokenizer.from_pretrained(model_name)
     model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-    device = _pick_device()
-    model.to(device)
     model.eval()
+    if device == "cpu" and settings.LOCAL_LLM_QUANTIZE:
+        model = _quantize(model)
+    model.to(device)
+    logger.info("Local LLM {} loaded on {} in {:.1f}s", model_name, device, time.monotonic() - started)
     return tok, model, device
 
 
+# torch already parallelizes one generate() across cores; a single worker
+# keeps local generations serialized instead of oversubscribing the CPU
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-t5")
+
+
+def _generate_batch_sync(prompts: List[str], max_new_tokens: int) -> List[str]:
+    import torch
+
+    tok, model, device = _load_model()
+    inputs = tok(
+        prompts,
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+        max_length=MAX_INPUT_TOKENS,
+    ).to(device)
+    with torch.no_grad():
+        out = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+        )
+    return [tok.decode(seq, skip_special_tokens=True).strip() for seq in out]
+
+
+@dataclass
+class _Request:
+    prompt: str
+    max_new_tokens: int
+    fut: asyncio.Future
+
+
+class _MicroBatcher:
+    """
+    Collects concurrent generate() calls for up to LOCAL_LLM_BATCH_WAIT_MS and
+    runs them as one padded model.generate (at most LOCAL_LLM_MAX_BATCH prompts).
+    """
+
+    def __init__(self) -> None:
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def submit(self, prompt: str, max_new_tokens: int) -> str:
+        queue = self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        await queue.put(_Request(prompt, max_new_tokens, fut))
+        return await fut
+
+    async def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        deadline = time.monotonic() + settings.LOCAL_LLM_BATCH_WAIT_MS / 1000
+        while len(batch) < max(1, settings.LOCAL_LLM_MAX_BATCH):
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return [r for r in batch if not r.fut.done()]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(await self._queue.get())
+            if not batch:
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                texts = await loop.run_in_executor(
+                    _EXECUTOR,
+                    _generate_batch_sync,
+                    [r.prompt for r in batch],
+                    max(r.max_new_tokens for r in batch),
+                )
+            except Exception as exc:
+                for r in batch:
+                    if not r.fut.done():
+                        r.fut.set_exception(exc)
+                continue
+            for r, text in zip(batch, texts):
+                if not r.fut.done():
+                    r.fut.set_result(text)
+
+
+_BATCHER = _MicroBatcher()
+
+
+async def warm_up() -> None:
+    """Load the model (and run one tiny generation) off the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_EXECUTOR, _generate_batch_sync, ["warm up"], 1)
+    except Exception as exc:
+        logger.warning("Local LLM warm-up failed: {}", exc)
+
+
 class LocalT5LLM:
-    def generate(self, prompt: str, max_new_tokens: int = 350) -> str:
-        tok, model, device = _load_model()
-        inputs = tok(prompt, return_tensors="pt", truncation=True, max_length=2048).to(device)
-        with torch.no_grad():
-            out = model.generate(
-                **inputs,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-            )
-        return tok.decode(out[0], skip_special_tokens=True).strip()
\ No newline at end of file
+    async def generate(self, prompt: str, max_new_tokens: int = 350) -> str:
+        """Micro-batched with concurrent calls; inference runs on the model executor."""
+        return await _BATCHER.submit(prompt, max_new_tokens)
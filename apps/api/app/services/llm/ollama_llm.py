@@ -1,7 +1,9 @@
 from __future__ import annotations
-import httpx
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from app.core.config import settings
+from app.core.http import get_http_client
 
 class OllamaLLM:
     def __init__(
@@ -15,16 +17,53 @@ class OllamaLLM:
         self.url = f"{base}/api/generate"
         self.timeout = timeout
 
-    def generate(self, prompt: str) -> str:
-        payload = {
+    async def generate(self, prompt: str) -> str:
+        text, _ = await self.generate_in_context(prompt)
+        return text
+
+    async def generate_in_context(
+        self, prompt: str, context: Optional[List[int]] = None
+    ) -> tuple[str, Optional[List[int]]]:
+        """
+        Generate after `context` (the token state Ollama returned for a previous
+        call), so only `prompt` needs prefilling. Returns (text, new context).
+        """
+        payload: Dict[str, Any] = {
             "model": self.model,
             "prompt": prompt,
             "stream": False,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {"num_ctx": settings.OLLAMA_NUM_CTX},
         }
+        if context:
+            payload["context"] = context
 
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.post(self.url, json=payload)
-            r.raise_for_status()
-            data = r.json()
+        r = await get_http_client().post(self.url, json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json()
+
+        return (data.get("response") or "").strip(), data.get("context")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield response pieces as Ollama generates them (NDJSON stream)."""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {"num_ctx": settings.OLLAMA_NUM_CTX},
+        }
 
-        return (data.get("response") or "").strip()
+        client = get_http_client()
+        async with client.stream("POST", self.url, json=payload, timeout=self.timeout) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
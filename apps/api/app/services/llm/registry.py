@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import importlib
+from typing import Any, Dict, Tuple
+
+# provider name -> (module, class); modules are imported on first use only,
+# so torch/transformers and google-genai cost nothing unless that provider runs
+PROVIDERS: Dict[str, Tuple[str, str]] = {
+    "gemini": ("app.services.llm.gemini_chat", "GeminiChatLLM"),
+    "ollama": ("app.services.llm.ollama_llm", "OllamaLLM"),
+    "local": ("app.services.llm.local_t5", "LocalT5LLM"),
+}
+
+_classes: Dict[str, type] = {}
+
+
+def provider_class(name: str) -> type:
+    cls = _classes.get(name)
+    if cls is None:
+        module, attr = PROVIDERS[name]
+        cls = getattr(importlib.import_module(module), attr)
+        _classes[name] = cls
+    return cls
+
+
+def create_provider(name: str) -> Any:
+    return provider_class(name)()
+
+
+def provider_module(name: str) -> Any:
+    """The provider's module (imports it), e.g. for local_t5.warm_up."""
+    return importlib.import_module(PROVIDERS[name][0])
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.llm.errors import LLMRateLimitError
+from app.services.llm.registry import PROVIDERS, create_provider
+
+
+class ProvidersUnavailableError(RuntimeError):
+    """Every provider in the chain is tripped; retry once a breaker half-opens."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("No LLM provider available (circuit breakers open)")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Generation:
+    text: str
+    provider: str
+    latency_ms: float
+    skipped: List[str] = field(default_factory=list)  # providers passed over (breaker open / failed)
+    context: Optional[List[int]] = None  # Ollama token state after this generation
+    used_context: bool = False  # answered as a continuation of the given context
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures (or trip()),
+    open -> half_open after `reset_seconds`: one trial call decides
+    closed (success) or open again (failure).
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self._trial_started = None
+        # a trial that never reported back (cancelled request) expires after reset_seconds
+        if self.state == "half_open" and (
+            self._trial_started is None or now - self._trial_started >= self.reset_seconds
+        ):
+            self._trial_started = now
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self._trial_started = None
+
+
+class ProviderHealth:
+    """Breaker + rolling window of outcomes and latencies for one provider."""
+
+    def __init__(self, breaker: CircuitBreaker, window: int = 50):
+        self.breaker = breaker
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.skipped = 0
+
+    def record(self, ok: bool, latency_ms: float) -> None:
+        self.calls += 1
+        self.outcomes.append(ok)
+        self.latencies_ms.append(latency_ms)
+
+    def latency_ms_p50(self) -> Optional[float]:
+        lat = sorted(self.latencies_ms)
+        return lat[len(lat) // 2] if lat else None
+
+    def stats(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "calls": self.calls,
+            "skipped": self.skipped,
+            "error_rate": round(self.outcomes.count(False) / len(self.outcomes), 4) if self.outcomes else 0.0,
+            "latency_ms_avg": round(sum(lat) / len(lat), 1) if lat else 0.0,
+            "latency_ms_p95": round(lat[int(0.95 * (len(lat) - 1))], 1) if lat else 0.0,
+        }
+
+
+class ProviderRouter:
+    """
+    Runs a prompt through the provider chain for LLM_PROVIDER:
+    - gemini | ollama | local: that provider only, errors propagate
+    - auto: gemini (only when a key is set) -> ollama -> local
+    Client instances are created once and reused. Providers whose breaker is
+    open are skipped without a call, so a dead primary costs nothing.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self._instances: Dict[str, Any] = {}
+        self.health: Dict[str, ProviderHealth] = {
+            name: ProviderHealth(CircuitBreaker(failure_threshold, reset_seconds)) for name in PROVIDERS
+        }
+
+    @classmethod
+    def from_settings(cls) -> "ProviderRouter":
+        return cls(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_SECONDS)
+
+    def chain(self) -> List[str]:
+        provider = (settings.LLM_PROVIDER or "auto").lower()
+        if provider in PROVIDERS:
+            return [provider]
+        chain = ["ollama", "local"]
+        if settings.GEMINI_API_KEY:
+            chain.insert(0, "gemini")
+        return chain
+
+    def candidates(self) -> List[str]:
+        """Chain minus providers whose breaker is still open (consumes no trial call)."""
+        chain = self.chain()
+        live = [
+            name for name in chain
+            if self.health[name].breaker.state != "open" or self.health[name].breaker.retry_after() == 0
+        ]
+        return live or chain
+
+    def primary(self) -> str:
+        """Provider the next call will most likely land on (consumes no trial call)."""
+        return self.candidates()[0]
+
+    def expected_latency_ms(self, name: str) -> float:
+        """Median of the recent generations, or LLM_EXPECTED_LATENCY_MS before any."""
+        measured = self.health[name].latency_ms_p50()
+        return measured if measured else float(settings.LLM_EXPECTED_LATENCY_MS.get(name, 10000))
+
+    def _ordered(self, prefer: Optional[str]) -> List[str]:
+        chain = self.chain()
+        if prefer in chain:
+            chain.remove(prefer)
+            chain.insert(0, prefer)
+        return chain
+
+    def _instance(self, name: str) -> Any:
+        inst = self._instances.get(name)
+        if inst is None:
+            inst = create_provider(name)  # imports the provider module on first use
+            self._instances[name] = inst
+        return inst
+
+    def _allows(self, name: str) -> bool:
+        # asked lazily, right before a call: a half-open breaker hands out its
+        # single trial call here
+        if self.health[name].breaker.allow():
+            return True
+        self.health[name].skipped += 1
+        return False
+
+    def _unavailable(self, chain: List[str]) -> ProvidersUnavailableError:
+        wait = min(self.health[name].breaker.retry_after() for name in chain)
+        return ProvidersUnavailableError(retry_after=max(1, int(wait + 0.999)))
+
+    def _failed(self, name: str, exc: Exception, latency_ms: float) -> None:
+        health = self.health[name]
+        health.record(False, latency_ms)
+        if isinstance(exc, LLMRateLimitError):
+            health.breaker.trip()  # quota errors won't clear on the next request
+        else:
+            health.breaker.record_failure()
+        logger.warning("LLM provider {} failed: {}", name, exc)
+
+    def _succeeded(self, name: str, latency_ms: float) -> None:
+        self.health[name].record(True, latency_ms)
+        self.health[name].breaker.record_success()
+
+    async def generate(
+        self,
+        prompt: str,
+        *,
+        context: Optional[List[int]] = None,
+        context_prompt: Optional[str] = None,
+        prefer: Optional[str] = None,
+    ) -> Generation:
+        """
+        context/context_prompt: Ollama session state and the (shorter) prompt to
+        continue it with. Ollama uses them; any other provider gets `prompt`.
+        prefer: provider to try first (the rest of the chain stays the fallback).
+        """
+        chain = self._ordered(prefer)
+        skipped: List[str] = []
+        last_exc: Optional[Exception] = None
+        for name in chain:
+            if not self._allows(name):
+                skipped.append(name)
+                continue
+            started = time.monotonic()
+            new_context = None
+            resumed = name == "ollama" and bool(context) and context_prompt is not None
+            try:
+                inst = self._instance(name)
+                if name == "ollama":
+                    text, new_context = await inst.generate_in_context(
+                        context_prompt if resumed else prompt,
+                        context if resumed else None,
+                    )
+                else:
+                    text = await inst.generate(prompt)
+            except Exception as exc:
+                self._failed(name, exc, (time.monotonic() - started) * 1000)
+                if len(chain) == 1:
+                    raise
+                skipped.append(name)
+                last_exc = exc
+                continue
+            latency_ms = (time.monotonic() - started) * 1000
+            self._succeeded(name, latency_ms)
+            return Generation(
+                text=text,
+                provider=name,
+                latency_ms=latency_ms,
+                skipped=skipped,
+                context=new_context,
+                used_context=resumed,
+            )
+        if last_exc is not None:
+            raise last_exc
+        raise self._unavailable(chain)
+
+    async def stream(self, prompt: str, prefer: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Token stream from the first healthy provider (prefer: tried first).
+        Ollama streams natively; others yield their whole answer once. Falls
+        through the chain only while nothing has been sent yet.
+        """
+        chain = self._ordered(prefer)
+        last_exc: Optional[Exception] = None
+        for name in chain:
+            if not self._allows(name):
+                continue
+            started = time.monotonic()
+            sent = False
+            try:
+                inst = self._instance(name)
+                if name == "ollama":
+                    async for piece in inst.stream(prompt):
+                        sent = True
+                        yield piece
+                else:
+                    text = await inst.generate(prompt)
+                    sent = True
+                    yield text
+            except Exception as exc:
+                self._failed(name, exc, (time.monotonic() - started) * 1000)
+                if sent or len(chain) == 1:
+                    raise
+                last_exc = exc
+                continue
+            self._succeeded(name, (time.monotonic() - started) * 1000)
+            return
+        if last_exc is not None:
+            raise last_exc
+        raise self._unavailable(chain)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"chain": self.chain(), "providers": {name: h.stats() for name, h in self.health.items()}}
+
+
+LLM_ROUTER = ProviderRouter.from_settings()
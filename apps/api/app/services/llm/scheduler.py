@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from app.core.config import settings
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+    INTERACTIVE = 0  # /ask, /search: a user is waiting
+    BACKGROUND = 1  # overview summaries
+    BULK = 2  # ingest embeddings, batch ask
+
+
+class SchedulerSaturatedError(Exception):
+    def __init__(self, priority: Priority, reason: str, retry_after: int):
+        super().__init__(f"LLM scheduler saturated ({priority.name.lower()}: {reason})")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class ClassPolicy:
+    concurrency: int
+    max_queue: int
+    max_wait_seconds: Optional[float]  # None: wait as long as it takes
+
+
+@dataclass
+class _Waiter:
+    fut: asyncio.Future
+    enqueued_at: float
+
+
+class _ClassStats:
+    def __init__(self) -> None:
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits_ms: Deque[float] = deque(maxlen=512)
+        self.service_s: Deque[float] = deque(maxlen=128)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.waits_ms)
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+            "wait_ms_max": round(waits[-1], 1) if waits else 0.0,
+        }
+
+
+class LLMScheduler:
+    """
+    Admission control + priority queueing in front of the model providers.
+    - a slot is needed for every provider call; at most `max_concurrency` run at once
+    - each class also has its own concurrency cap, so bulk work never holds every slot
+    - free slots go to the highest-priority waiting class (FIFO within a class)
+    - full queues and queue-time limits raise SchedulerSaturatedError (-> 503 + Retry-After)
+    """
+
+    def __init__(self, max_concurrency: int, policies: Dict[Priority, ClassPolicy]):
+        self.max_concurrency = max(1, max_concurrency)
+        self.policies = policies
+        self._queues: Dict[Priority, Deque[_Waiter]] = {p: deque() for p in Priority}
+        self._active: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._stats: Dict[Priority, _ClassStats] = {p: _ClassStats() for p in Priority}
+
+    @classmethod
+    def from_settings(cls) -> "LLMScheduler":
+        return cls(
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            policies={
+                Priority.INTERACTIVE: ClassPolicy(
+                    concurrency=settings.LLM_INTERACTIVE_CONCURRENCY,
+                    max_queue=settings.LLM_MAX_QUEUE,
+                    max_wait_seconds=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+                ),
+                Priority.BACKGROUND: ClassPolicy(
+                    concurrency=settings.LLM_BACKGROUND_CONCURRENCY,
+                    max_queue=settings.LLM_MAX_QUEUE,
+                    max_wait_seconds=settings.LLM_BACKGROUND_QUEUE_TIMEOUT_SECONDS,
+                ),
+                Priority.BULK: ClassPolicy(
+                    concurrency=settings.LLM_BULK_CONCURRENCY,
+                    max_queue=settings.LLM_BULK_MAX_QUEUE,
+                    max_wait_seconds=None,
+                ),
+            },
+        )
+
+    def _total_active(self) -> int:
+        return sum(self._active.values())
+
+    def _can_run(self, priority: Priority) -> bool:
+        return (
+            self._active[priority] < max(1, self.policies[priority].concurrency)
+            and self._total_active() < self.max_concurrency
+        )
+
+    def retry_after(self, priority: Priority) -> int:
+        """Rough seconds until a newly queued request would start."""
+        service = self._stats[priority].service_s
+        avg = sum(service) / len(service) if service else 1.0
+        depth = len(self._queues[priority]) + 1
+        slots = max(1, min(self.policies[priority].concurrency, self.max_concurrency))
+        return max(1, min(120, math.ceil(depth * avg / slots)))
+
+    def admit(self, priority: Priority) -> None:
+        """Fast rejection when the class queue is full; call before committing to a response."""
+        if len(self._queues[priority]) >= self.policies[priority].max_queue:
+            self._stats[priority].rejected += 1
+            raise SchedulerSaturatedError(priority, "queue full", self.retry_after(priority))
+
+    def _dispatch(self) -> None:
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue and self._can_run(priority):
+                waiter = queue.popleft()
+                if waiter.fut.done():  # timed out / cancelled while queued
+                    continue
+                self._active[priority] += 1
+                self._stats[priority].waits_ms.append((time.monotonic() - waiter.enqueued_at) * 1000)
+                waiter.fut.set_result(None)
+
+    async def acquire(self, priority: Priority) -> None:
+        self.admit(priority)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), time.monotonic())
+        self._queues[priority].append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(waiter.fut, timeout=self.policies[priority].max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.fut.done() and not waiter.fut.cancelled():
+                self.release(priority)  # granted right as we gave up
+            try:
+                self._queues[priority].remove(waiter)
+            except ValueError:
+                pass
+            if isinstance(exc, asyncio.TimeoutError):
+                self._stats[priority].timed_out += 1
+                raise SchedulerSaturatedError(priority, "queue timeout", self.retry_after(priority)) from None
+            raise
+        self._stats[priority].admitted += 1
+
+    def release(self, priority: Priority, service_seconds: Optional[float] = None) -> None:
+        self._active[priority] -= 1
+        if service_seconds is not None:
+            self._stats[priority].service_s.append(service_seconds)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(priority, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._total_active(),
+            "classes": {
+                p.name.lower(): {
+                    "concurrency": self.policies[p].concurrency,
+                    "active": self._active[p],
+                    "queued": len(self._queues[p]),
+                    "max_queue": self.policies[p].max_queue,
+                    **self._stats[p].snapshot(),
+                }
+                for p in Priority
+            },
+        }
+
+
+LLM_SCHEDULER = LLMScheduler.from_settings()
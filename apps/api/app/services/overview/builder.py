@@ -1,3 +1,4 @@
+import re
 from collections import defaultdict
 from bson import ObjectId
 from app.db.mongo import get_db
@@ -16,29 +17,66 @@ TECH_KEYWORDS = {
     "Gemini": ["gemini"],
 }
 
+
+def _tech_flag_fields() -> dict:
+    """
+    One boolean per tech: does the chunk's path or text mention any keyword?
+    Evaluated inside Mongo so chunk text never leaves the server.
+    """
+    haystack = {"$concat": [{"$ifNull": ["$path", ""]}, "\n", {"$ifNull": ["$text", ""]}]}
+    return {
+        f"t{i}": {
+            "$regexMatch": {
+                "input": haystack,
+                "regex": "|".join(re.escape(k) for k in keys),
+                "options": "i",
+            }
+        }
+        for i, keys in enumerate(TECH_KEYWORDS.values())
+    }
+
+
+def overview_pipeline(repo_id: ObjectId) -> list:
+    """
+    Per-path manifest: chunk count + tech match flags (a few KB per repo).
+    """
+    flags = _tech_flag_fields()
+    return [
+        {"$match": {"repo_id": repo_id}},
+        {"$project": {"path": 1, **flags}},
+        {
+            "$group": {
+                "_id": "$path",
+                "chunks": {"$sum": 1},
+                **{name: {"$max": f"${name}"} for name in flags},
+            }
+        },
+    ]
+
+
 async def build_overview(repo_id: ObjectId) -> dict:
     db = get_db()
-    rows = await db["code_chunks"].find(
-        {"repo_id": repo_id},
-        {"path": 1, "text": 1},
-    ).to_list(length=None)
+    manifest = await db["code_chunks"].aggregate(overview_pipeline(repo_id)).to_list(length=None)
 
     components = defaultdict(set)
     tech_stack = set()
+    techs = list(TECH_KEYWORDS)
+    total_chunks = 0
 
-    for r in rows:
-        path = r["path"].lower()
-        text = (r.get("text") or "").lower()
+    for m in manifest:
+        path = m["_id"] or ""
+        lp = path.lower()
+        total_chunks += m["chunks"]
 
         for comp, hints in KEY_COMPONENTS.items():
-            if any(h in path for h in hints):
-                components[comp].add(r["path"])
+            if any(h in lp for h in hints):
+                components[comp].add(path)
 
-        for tech, keys in TECH_KEYWORDS.items():
-            if any(k in text or k in path for k in keys):
+        for i, tech in enumerate(techs):
+            if m.get(f"t{i}"):
                 tech_stack.add(tech)
 
-    confidence = "high" if len(rows) > 150 else "medium" if len(rows) > 50 else "low"
+    confidence = "high" if total_chunks > 150 else "medium" if total_chunks > 50 else "low"
 
     return {
         "components": [
@@ -47,4 +85,4 @@ async def build_overview(repo_id: ObjectId) -> dict:
         ],
         "tech_stack": sorted(tech_stack),
         "confidence": confidence,
-    }
\ No newline at end of file
+    }
@@ -1,6 +1,6 @@
-from app.services.llm.ollama_llm import OllamaLLM
+from app.services.llm.router import LLM_ROUTER
 
-def generate_summary(components: list, tech_stack: list) -> str:
+async def generate_summary(components: list, tech_stack: list) -> str:
     prompt = f"""
 You are a software architect.
 
@@ -15,4 +15,5 @@ Components:
 Tech stack:
 {tech_stack}
 """
-    return OllamaLLM().generate(prompt)
\ No newline at end of file
+    # shared clients, circuit breakers and LLM_PROVIDER selection
+    return (await LLM_ROUTER.generate(prompt)).text.strip()
\ No newline at end of file
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.cache import SingleFlight, TTLCache
+from app.core.config import settings
+from app.services.embeddings.query_embedder import embed_query
+from app.services.llm.scheduler import Priority
+from app.services.retrieval.cache import normalize_question
+
+
+@dataclass
+class CachedAnswer:
+    question: str  # normalized
+    vector: Optional[List[float]]  # unit-length question embedding
+    result: Dict[str, Any]
+
+
+def _unit(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vec))
+    if not norm:
+        return list(vec)
+    return [x / norm for x in vec]
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class AnswerCache:
+    """
+    Answers keyed by (repo_id, index generation, k, normalized question).
+    - exact hit: same normalized question
+    - semantic hit: question embedding cosine >= threshold within the same scope
+    - single-flight: concurrent identical questions share one computation
+      (a follower takes over if the leading request is cancelled)
+    Only use it for history-free questions; history changes the prompt.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, threshold: float):
+        self.cache = TTLCache("answers", maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.threshold = threshold
+        self.semantic_hits = 0
+        self.shared_inflight = 0
+        self._flight = SingleFlight()
+
+    async def get_or_compute(
+        self,
+        scope: tuple,
+        question: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Dict[str, Any]:
+        normq = normalize_question(question)
+        key = (*scope, normq)
+
+        hit = self.cache.get(key)
+        if hit is not None:
+            return {**hit.result, "cached": True}
+
+        led = False
+
+        async def lookup_or_compute() -> Dict[str, Any]:
+            nonlocal led
+            led = True
+            vector = await self._question_vector(question, priority)
+            similar = self._semantic_lookup(scope, vector)
+            if similar is not None:
+                self.semantic_hits += 1
+                return {**similar.result, "cached": True}
+            result = await compute()
+            self.cache.set(key, CachedAnswer(question=normq, vector=vector, result=result))
+            return result
+
+        result = await self._flight.run(key, lookup_or_compute)
+        if led:
+            return result
+        self.shared_inflight += 1
+        return dict(result)
+
+    async def _question_vector(self, question: str, priority: Priority) -> Optional[List[float]]:
+        try:
+            return _unit(await embed_query(question, priority))
+        except Exception:
+            # semantic matching is best-effort; exact matching still works
+            return None
+
+    def _semantic_lookup(self, scope: tuple, vector: Optional[List[float]]) -> Optional[CachedAnswer]:
+        if vector is None:
+            return None
+        best: Optional[CachedAnswer] = None
+        best_sim = self.threshold
+        for key, entry in self.cache.items():
+            if key[: len(scope)] != scope or entry.vector is None:
+                continue
+            sim = _dot(vector, entry.vector)
+            if sim >= best_sim:
+                best, best_sim = entry, sim
+        return best
+
+    def invalidate_repo(self, repo_id) -> None:
+        rid = str(repo_id)
+        self.cache.invalidate(lambda key: key[0] == rid)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "semantic_hits": self.semantic_hits,
+            "shared_inflight": self.shared_inflight,
+        }
+
+
+ANSWER_CACHE = AnswerCache(
+    maxsize=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
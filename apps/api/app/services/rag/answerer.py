@@ -1,23 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
+from functools import partial
 import re
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 from bson import ObjectId
 from pymongo.errors import OperationFailure
 
 from app.db.mongo import get_db
+from app.core.cache import SingleFlight
 from app.core.config import settings
-from app.services.embeddings.ollama_embedder import OllamaEmbedder
+from app.db.repos import get_index_generation
+from app.services.embeddings.query_embedder import embed_query
 
-from app.services.llm.gemini_chat import GeminiChatLLM
-from app.services.llm.local_t5 import LocalT5LLM
-from app.services.llm.ollama_llm import OllamaLLM
-from app.services.llm.gemini_chat import LLMRateLimitError
+from app.services.llm.router import LLM_ROUTER
+from app.services.llm.scheduler import LLM_SCHEDULER, Priority
 
-from app.services.rag.symbols import extract_python_symbols
-from app.services.rag.links import extract_python_links
 from app.services.rag.intent import classify_intent
+from app.services.retrieval.fusion import reciprocal_rank_fusion
+from app.services.retrieval.cache import RETRIEVAL_CACHE, normalize_question
+from app.services.rag.answer_cache import ANSWER_CACHE
+from app.services.rag.history import load_llm_context, save_llm_context
+from app.services.rag.deadline import Deadline, plan_answer
+from app.services.rag.packer import PackedPrompt, pack_followup, pack_prompt
+from app.services.rag.reranker import rerank
+from app.services.rag.spans import merge_chunks
+from app.services.indexing.symbol_index import get_symbol_table
 
 @dataclass
 class RetrievedChunk:
@@ -76,39 +85,32 @@ def _build_keyword_regex(keywords: List[str]) -> str | None:
     return "|".join(terms)
 
 
-def _rank_candidate(row: Dict[str, Any], *, keywords: List[str], path_hints: List[str]) -> float:
-    path = (row.get("path") or "").lower()
-    text = (row.get("text") or "").lower()
-
-    score = float(row.get("score", 0.0) or 0.0)
-    if path.endswith(".py"):
-        score += 0.2
-
-    path_matches = sum(1 for hint in path_hints if hint and hint in path)
-    term_matches = sum(1 for kw in keywords if kw in text)
-    exact_path_terms = sum(1 for kw in keywords if kw in path)
-
-    score += path_matches * 2.0
-    score += exact_path_terms * 1.2
-    score += min(term_matches, 6) * 0.35
-    return score
-
-def _format_chunks(chunks: List[RetrievedChunk]) -> str:
-    blocks = []
-    for i, c in enumerate(chunks, start=1):
-        blocks.append(
-            f"[{i}] {c.path}:{c.start_line}-{c.end_line}\n"
-            f"```text\n{c.text}\n```"
-        )
-    return "\n\n".join(blocks)
-
-
 def _is_local_vector_search_error(exc: Exception) -> bool:
     if not isinstance(exc, OperationFailure):
         return False
     return "$vectorSearch stage is only allowed on MongoDB Atlas" in str(exc)
 
 
+# Phase 1 ranks on these lightweight fields only; chunk text is fetched for
+# the survivors in phase 2 (_fetch_texts).
+CANDIDATE_PROJECTION = {
+    "_id": 1,
+    "path": 1,
+    "start_line": 1,
+    "end_line": 1,
+    "text_len": 1,
+    "terms": 1,
+}
+
+
+async def _fetch_texts(ids: List[ObjectId]) -> Dict[ObjectId, str]:
+    if not ids:
+        return {}
+    db = get_db()
+    cursor = db["code_chunks"].find({"_id": {"$in": ids}}, {"text": 1})
+    return {d["_id"]: d.get("text") or "" async for d in cursor}
+
+
 async def _keyword_rows(
     repo_oid: ObjectId,
     *,
@@ -123,302 +125,581 @@ async def _keyword_rows(
             {"path": {"$regex": keyword_regex, "$options": "i"}},
         ]
 
-    cursor = db["code_chunks"].find(
-        query,
-        {"_id": 0, "path": 1, "start_line": 1, "end_line": 1, "text": 1},
-    ).limit(limit)
+    cursor = db["code_chunks"].find(query, CANDIDATE_PROJECTION).limit(limit)
     return await cursor.to_list(length=limit)
 
-async def retrieve_chunks(repo_oid: ObjectId, question: str, k: int = 8) -> List[RetrievedChunk]:
-    db = get_db()
-    q = question.lower()
-    flow_mode = any(
-        x in q for x in (
-            "end-to-end", "end to end", "flow", "pipeline",
-            "how does", "how is", "steps", "process"
-        )
-    )
-
-    intent = classify_intent(question)
-    profile = _intent_profile(intent)
-    path_hints = profile["path_hints"]
-    keywords = _question_keywords(question, extra=profile["keywords"])
-    keyword_regex = _build_keyword_regex(keywords)
 
-    min_len = 40 if intent == "github_fetch" else 80
-    fetch_limit = max(k * 8, 80) if flow_mode else max(k * 5, 40)
-    filter_doc = {"repo_id": repo_oid}
+async def _vector_rows(
+    repo_oid: ObjectId,
+    question: str,
+    *,
+    limit: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> List[Dict[str, Any]] | None:
+    """
+    Vector leg of retrieval.
+    Returns None when $vectorSearch is unavailable (local MongoDB).
+    """
+    db = get_db()
+    qvec = await embed_query(question, priority)
     pipeline = [
         {
             "$vectorSearch": {
                 "index": settings.MONGODB_VECTOR_INDEX,
                 "path": "embedding",
-                "queryVector": [],
-                "filter": filter_doc,
-                "numCandidates": max(400, fetch_limit * 5),
-                "limit": fetch_limit,
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "path": 1,
-                "start_line": 1,
-                "end_line": 1,
-                "text": 1,
-                "score": {"$meta": "vectorSearchScore"},
+                "queryVector": qvec,
+                "filter": {"repo_id": repo_oid},
+                "numCandidates": max(400, limit * 5),
+                "limit": limit,
             }
         },
+        {"$project": {**CANDIDATE_PROJECTION, "score": {"$meta": "vectorSearchScore"}}},
     ]
-
     try:
-        embedder = OllamaEmbedder()
-        qvec = embedder.embed_text(question)
-        pipeline[0]["$vectorSearch"]["queryVector"] = qvec
-        rows = await db["code_chunks"].aggregate(pipeline).to_list(length=None)
+        return await db["code_chunks"].aggregate(pipeline).to_list(length=None)
     except Exception as exc:
         if not _is_local_vector_search_error(exc):
             raise
-        rows = await _keyword_rows(repo_oid, keyword_regex=keyword_regex, limit=max(80, k * 10))
+        return None
 
-    rows.sort(key=lambda r: _rank_candidate(r, keywords=keywords, path_hints=path_hints), reverse=True)
 
-    out: List[RetrievedChunk] = []
-    seen: set[tuple[str, int, int]] = set()
+def _row_key(row: Dict[str, Any]) -> tuple[str, int, int]:
+    return (
+        row.get("path") or "",
+        int(row.get("start_line", 0) or 0),
+        int(row.get("end_line", 0) or 0),
+    )
 
-    for r in rows:
-        path = (r.get("path") or "")
-        text = (r.get("text") or "").strip()
 
-        lp = path.lower()
-        if path_hints and not any(p in lp for p in path_hints) and not any(kw in lp for kw in keywords):
-            continue
-        if lp.endswith(".md") or lp in ("readme.md", "license", "license.md"):
-            continue
-        if lp.endswith(".gitignore") or lp.endswith(".dockerignore"):
-            continue
+def _is_noise_path(lp: str) -> bool:
+    if lp.endswith(".md") or lp in ("readme.md", "license", "license.md"):
+        return True
+    return lp.endswith(".gitignore") or lp.endswith(".dockerignore")
+
+
+class CandidateScorer:
+    """
+    Ranks and filters the candidate rows of one question in a single pass per call.
+    - path features (hint / keyword hits, .py, noise) are computed once per
+      distinct path and reused by every chunk of that file, across all legs
+    - term matches are substring checks against the terms stored at index time,
+      joined once per row, so "ingest" still matches "ingestion" as it does in text
+    """
+
+    def __init__(self, keywords: List[str], path_hints: List[str]):
+        self.keywords = keywords
+        self.path_hints = path_hints
+        # lowercased path -> (is .py, hint hits, keyword hits, noise)
+        self._paths: Dict[str, tuple[bool, int, int, bool]] = {}
+
+    def _path(self, row: Dict[str, Any]) -> tuple[bool, int, int, bool]:
+        lp = (row.get("path") or "").lower()
+        feats = self._paths.get(lp)
+        if feats is None:
+            feats = self._paths[lp] = (
+                lp.endswith(".py"),
+                sum(1 for hint in self.path_hints if hint and hint in lp),
+                sum(1 for kw in self.keywords if kw in lp),
+                _is_noise_path(lp),
+            )
+        return feats
+
+    def scores(self, rows: List[Dict[str, Any]]) -> List[float]:
+        out: List[float] = []
+        for row in rows:
+            is_py, path_matches, exact_path_terms, _ = self._path(row)
+            terms = row.get("terms")
+            if terms is not None:
+                # keywords never contain "\n", so this is "kw in some term"
+                haystack = "\n".join(terms)
+                term_matches = sum(1 for kw in self.keywords if kw in haystack)
+            else:
+                text = (row.get("text") or "").lower()
+                term_matches = sum(1 for kw in self.keywords if kw in text)
+
+            score = float(row.get("score", 0.0) or 0.0)
+            if is_py:
+                score += 0.2
+            score += path_matches * 2.0
+            score += exact_path_terms * 1.2
+            score += min(term_matches, 6) * 0.35
+            out.append(score)
+        return out
+
+    def rank(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        scores = self.scores(rows)
+        order = sorted(range(len(rows)), key=scores.__getitem__, reverse=True)
+        return [rows[i] for i in order]
+
+    def filter(self, rows: List[Dict[str, Any]], *, min_len: int, require_hint: bool) -> List[Dict[str, Any]]:
+        """
+        Drop noise files, tiny chunks and duplicates (order preserved).
+        require_hint: with an intent profile, keep only paths matching a hint or keyword.
+        """
+        out: List[Dict[str, Any]] = []
+        seen: set[tuple[str, int, int]] = set()
+        for r in rows:
+            _, path_matches, exact_path_terms, noise = self._path(r)
+            if require_hint and self.path_hints and not path_matches and not exact_path_terms:
+                continue
+            if noise:
+                continue
+            text_len = r.get("text_len")
+            if text_len is not None and text_len < min_len:
+                continue
+            key = _row_key(r)
+            if key in seen:
+                continue
+            seen.add(key)
+            out.append(r)
+        return out
 
-        if len(text) < min_len:
-            continue
 
-        start_line = int(r.get("start_line", 0) or 0)
-        end_line = int(r.get("end_line", 0) or 0)
-        key = (path, start_line, end_line)
-        if key in seen:
-            continue
-        seen.add(key)
-
-        out.append(
-            RetrievedChunk(
-                path=path,
-                start_line=start_line,
-                end_line=end_line,
-                text=text,
-                score=float(r.get("score", 0.0) or 0.0),
-            )
-        )
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+MAX_SYMBOL_DEFS = 3
+
+
+def _question_identifiers(question: str) -> List[str]:
+    """
+    Terms in a question that look like code identifiers:
+    `backticked`, snake_case, CamelCase or Dotted.names.
+    """
+    found = [m.strip() for m in re.findall(r"`([^`]+)`", question)]
+    for token in IDENTIFIER_RE.findall(question):
+        if "_" in token or "." in token or re.search(r"[a-z][A-Z]", token):
+            found.append(token)
+
+    out: List[str] = []
+    for name in found:
+        name = name.removesuffix("()")
+        if name and name not in out:
+            out.append(name)
+    return out
+
+
+async def _symbol_rows(repo_oid: ObjectId, question: str) -> List[Dict[str, Any]]:
+    """
+    High-precision first stage: chunks containing the definition of an
+    identifier mentioned in the question, via the repo's symbol table.
+    """
+    names = _question_identifiers(question)
+    if not names:
+        return []
+
+    table = await get_symbol_table(repo_oid)
+    defs = [d for name in names for d in table.lookup(name)][:MAX_SYMBOL_DEFS]
+    if not defs:
+        return []
 
-        # For normal Qs, stop early. For flow_mode, collect more before slicing.
-        if not flow_mode and len(out) >= k:
-            break
+    db = get_db()
+    rows = await db["code_chunks"].find(
+        {
+            "repo_id": repo_oid,
+            "$or": [
+                {
+                    "path": d["path"],
+                    "start_line": {"$lte": d["start_line"]},
+                    "end_line": {"$gte": d["start_line"]},
+                }
+                for d in defs
+            ],
+        },
+        CANDIDATE_PROJECTION,
+    ).to_list(length=None)
+
+    # per definition, the covering chunk that starts closest to it holds most of its body
+    out: List[Dict[str, Any]] = []
+    for d in defs:
+        line = d["start_line"]
+        covering = [
+            r for r in rows
+            if r.get("path") == d["path"] and r.get("start_line", 0) <= line <= r.get("end_line", 0)
+        ]
+        if covering:
+            best = max(covering, key=lambda r: r.get("start_line", 0))
+            out.append({**best, "score": 1.0})
+    return out
+
+
+def _use_hybrid(*, flow_mode: bool, intent: str) -> bool:
+    mode = (settings.RETRIEVAL_MODE or "auto").lower()
+    if mode == "hybrid":
+        return True
+    if mode == "vector":
+        return False
+    return flow_mode or intent in {"github_fetch", "api_flow"}
 
-    need_keyword_fallback = bool(keyword_regex) and (
-        len(out) < min(k, 5) or flow_mode or intent in {"github_fetch", "api_flow"}
+
+_RETRIEVAL_INFLIGHT = SingleFlight()
+
+
+async def retrieve_chunks(
+    repo_oid: ObjectId,
+    question: str,
+    k: int = 8,
+    priority: Priority = Priority.INTERACTIVE,
+) -> List[RetrievedChunk]:
+    """
+    Cached front of _retrieve_chunks, keyed by repo index generation so a
+    re-ingest never serves results from the previous index. A call made while
+    the same retrieval is in flight (e.g. prefetched by /ask) joins it.
+    priority: LLM_SCHEDULER class for the query embedding.
+    """
+    generation = await get_index_generation(repo_oid)
+    key = (str(repo_oid), generation, normalize_question(question), k)
+    cached = RETRIEVAL_CACHE.get(key)
+    if cached is not None:
+        return list(cached)
+
+    async def retrieve() -> List[RetrievedChunk]:
+        chunks = await _retrieve_chunks(repo_oid, question, k=k, priority=priority)
+        if chunks:
+            RETRIEVAL_CACHE.set(key, list(chunks))
+        return chunks
+
+    return list(await _RETRIEVAL_INFLIGHT.run(key, retrieve))
+
+
+async def _retrieve_chunks(
+    repo_oid: ObjectId,
+    question: str,
+    k: int = 8,
+    priority: Priority = Priority.INTERACTIVE,
+) -> List[RetrievedChunk]:
+    """
+    Retrieve the top-k chunks for a question.
+    - vector mode: $vectorSearch, lexical leg only when it comes back short
+    - hybrid mode: vector + lexical legs run concurrently, fused with RRF
+    - local MongoDB (no $vectorSearch): lexical leg only
+    - identifiers found in the symbol table put their defining chunk first
+    Candidates are ranked on ids/paths/scores/terms; text is fetched for the top-k only.
+    """
+    q = question.lower()
+    flow_mode = any(
+        x in q for x in (
+            "end-to-end", "end to end", "flow", "pipeline",
+            "how does", "how is", "steps", "process"
+        )
     )
-    if need_keyword_fallback:
-        extra = await _keyword_rows(repo_oid, keyword_regex=keyword_regex, limit=max(50, k * 8))
-        extra.sort(key=lambda r: _rank_candidate(r, keywords=keywords, path_hints=path_hints), reverse=True)
-        for r in extra:
-            path = (r.get("path") or "")
-            text = (r.get("text") or "").strip()
-            if len(text) < 80:
-                continue
 
-            lp = path.lower()
-            if lp.endswith(".md") or lp in ("readme.md", "license", "license.md"):
-                continue
+    intent = classify_intent(question)
+    profile = _intent_profile(intent)
+    path_hints = profile["path_hints"]
+    keywords = _question_keywords(question, extra=profile["keywords"])
+    keyword_regex = _build_keyword_regex(keywords)
 
-            start_line = int(r.get("start_line", 0) or 0)
-            end_line = int(r.get("end_line", 0) or 0)
-            key = (path, start_line, end_line)
-            if key in seen:
-                continue
-            seen.add(key)
+    min_len = 40 if intent == "github_fetch" else 80
+    fetch_limit = max(k * 8, 80) if flow_mode else max(k * 5, 40)
+    scorer = CandidateScorer(keywords, path_hints)
+
+    def ranked(rows: List[Dict[str, Any]], *, require_hint: bool) -> List[Dict[str, Any]]:
+        return scorer.filter(scorer.rank(rows), min_len=min_len, require_hint=require_hint)
 
+    async def candidate_rows() -> List[Dict[str, Any]]:
+        if keyword_regex and _use_hybrid(flow_mode=flow_mode, intent=intent):
+            vector_rows, lexical_rows = await asyncio.gather(
+                _vector_rows(repo_oid, question, limit=fetch_limit, priority=priority),
+                _keyword_rows(repo_oid, keyword_regex=keyword_regex, limit=max(50, k * 8)),
+            )
+            legs = [ranked(lexical_rows, require_hint=False)]
+            if vector_rows is not None:
+                legs.insert(0, ranked(vector_rows, require_hint=True))
+            return reciprocal_rank_fusion(legs, key=_row_key, k=settings.RRF_K)
+
+        vector_rows = await _vector_rows(repo_oid, question, limit=fetch_limit, priority=priority)
+        if vector_rows is None:
+            vector_rows = await _keyword_rows(repo_oid, keyword_regex=keyword_regex, limit=max(80, k * 10))
+        rows = ranked(vector_rows, require_hint=True)
+
+        if keyword_regex and len(rows) < min(k, 5):
+            lexical_rows = await _keyword_rows(repo_oid, keyword_regex=keyword_regex, limit=max(50, k * 8))
+            rows = reciprocal_rank_fusion(
+                [rows, ranked(lexical_rows, require_hint=False)], key=_row_key, k=settings.RRF_K
+            )
+        return rows
+
+    # Exact symbol definitions go first; they're looked up alongside the legs.
+    symbol_rows, rows = await asyncio.gather(_symbol_rows(repo_oid, question), candidate_rows())
+    if symbol_rows:
+        rows = scorer.filter([*symbol_rows, *rows], min_len=min_len, require_hint=False)
+
+    # Phase 2: hydrate text for the survivors only. Chunks indexed before
+    # text_len existed are length-checked here, so top up if any drop out.
+    out: List[RetrievedChunk] = []
+    pos = 0
+    while len(out) < k and pos < len(rows):
+        batch = rows[pos:pos + k - len(out)]
+        pos += len(batch)
+        texts = await _fetch_texts([r["_id"] for r in batch if "_id" in r])
+        for r in batch:
+            text = texts.get(r.get("_id"), "").strip()
+            if len(text) < min_len:
+                continue
             out.append(
                 RetrievedChunk(
-                    path=path,
-                    start_line=start_line,
-                    end_line=end_line,
+                    path=r.get("path") or "",
+                    start_line=int(r.get("start_line", 0) or 0),
+                    end_line=int(r.get("end_line", 0) or 0),
                     text=text,
-                    score=0.0,  # keyword fallback
+                    score=float(r.get("score", 0.0) or 0.0),
                 )
             )
+    return out
 
-            if len(out) >= max(k, 10 if flow_mode else k):
-                break
+DEADLINE_EXCEEDED_ANSWER = "No answer within the requested deadline; see the sources below."
 
-    return out[:k]
 
-def build_prompt(question: str, chunks: List[RetrievedChunk], history: List[Dict[str, str]]) -> str:
-    history_text = ""
-    if history:
-        parts = []
-        for m in history:
-            role = m["role"].upper()
-            parts.append(f"{role}: {m['content']}")
-        history_text = "\n".join(parts)
+def prompt_budget() -> Optional[int]:
+    """Token budget of the provider the next generation will most likely use."""
+    return settings.PROMPT_TOKEN_BUDGETS.get(LLM_ROUTER.primary())
 
-    context = _format_chunks(chunks) if chunks else "(no relevant context found)"
 
-    evidence_refs = "\n".join(
-        [f"[{i+1}] {c.path}:{c.start_line}-{c.end_line}" for i, c in enumerate(chunks)]
-    ) or "(none)"
+async def generate_answer(
+    repo_oid: ObjectId,
+    question: str,
+    history: List[Dict[str, str]],
+    k: int = 8,
+    llm_slots: asyncio.Semaphore | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+    session_oid: Optional[ObjectId] = None,
+    deadline_ms: Optional[int] = None,
+    has_llm_context: bool = False,
+) -> Dict[str, Any]:
+    """
+    Answer a question about a repo.
+    history: earlier turns only (the question itself is passed separately).
+    Questions without earlier turns go through ANSWER_CACHE (scoped to the
+    repo's index generation); with history the prompt differs, and a session
+    whose model-side context can be continued (has_llm_context) answers from
+    it, so the cache is bypassed.
+    llm_slots: optional semaphore bounding concurrent LLM generations (batch ask).
+    priority: LLM_SCHEDULER class for the generation and the query embedding.
+    session_oid: chat session whose model-side context can be continued / started.
+    deadline_ms: latency target; the answer is planned (and cut off) to meet it
+    and reports its "degradations".
+    """
+    if deadline_ms is not None:
+        return await _generate_within_deadline(repo_oid, question, history, k, deadline_ms, priority, session_oid)
+    if history or has_llm_context:
+        if session_oid is not None:
+            return await _generate_session_answer(repo_oid, session_oid, question, history, k, priority)
+        return await _generate_answer(repo_oid, question, history, k=k, llm_slots=llm_slots, priority=priority)
+
+    if session_oid is not None:
+        # a miss still starts the session's model-side context for its follow-ups
+        compute = partial(_generate_session_answer, repo_oid, session_oid, question, [], k, priority)
+    else:
+        compute = partial(_generate_answer, repo_oid, question, [], k=k, llm_slots=llm_slots, priority=priority)
+    generation = await get_index_generation(repo_oid)
+    return await ANSWER_CACHE.get_or_compute((str(repo_oid), generation, k), question, compute, priority)
 
 
-    return f"""SYSTEM:
-You are a senior software engineer.
-Use ONLY the CODE CONTEXT. Do not guess.
+async def _call_llm(prompt: str) -> str:
+    return (await LLM_ROUTER.generate(prompt)).text
 
-If the CODE CONTEXT does not contain enough information to answer, reply exactly:
-Not found in this repository.
 
-CHAT HISTORY:
-{history_text if history_text else "(none)"}
+async def stream_llm(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream answer text. Ollama streams token by token; other providers (and
+    fallbacks before any token was sent) yield one final piece.
+    """
+    async with LLM_SCHEDULER.slot(Priority.INTERACTIVE):
+        async for piece in LLM_ROUTER.stream(prompt):
+            yield piece
 
-QUESTION:
-{question}
 
-EVIDENCE REFERENCES (verbatim excerpts from the repository):
-{context}
+def format_sources(chunks: List[RetrievedChunk]) -> List[Dict[str, Any]]:
+    return [
+        {"n": i + 1, "path": c.path, "start_line": c.start_line, "end_line": c.end_line, "score": c.score}
+        for i, c in enumerate(chunks)
+    ]
 
-EVIDENCE CITATIONS (copy EXACTLY; do not invent):
-{evidence_refs}
 
-PIPELINE HINTS (use these to explain "what calls what"; do not invent names):
-{_pipeline_hints(chunks)}
+async def prepare_answer(
+    repo_oid: ObjectId,
+    question: str,
+    history: List[Dict[str, str]],
+    k: int = 8,
+    priority: Priority = Priority.INTERACTIVE,
+) -> PackedPrompt:
+    """
+    Retrieval + prompt packing: everything before the LLM call.
+    The packed prompt's chunks are the cited sources (some may not fit the budget).
+    """
+    chunks = await _evidence_chunks(repo_oid, question, k, priority)
+    return pack_prompt(question, chunks, history, budget=prompt_budget())
+
+
+async def _evidence_chunks(
+    repo_oid: ObjectId,
+    question: str,
+    k: int,
+    priority: Priority = Priority.INTERACTIVE,
+    rerank_spans: bool = True,
+) -> List[RetrievedChunk]:
+    chunks = await retrieve_chunks(repo_oid, question, k=k, priority=priority)
+    # one contiguous span per run of overlapping/adjacent chunks of a file
+    spans = merge_chunks(chunks)[:k]
+    if settings.RERANKER_MODEL and rerank_spans:
+        # fewer, higher-precision spans for the prompt
+        spans = await rerank(question, spans, settings.RERANK_TOP_N)
+    return spans
 
-SYMBOL HINTS (use these names if relevant; do not invent new names):
-{_symbol_hints(chunks)}
 
-RESPONSE FORMAT (follow strictly):
+def _chunk_key(c: RetrievedChunk) -> List[Any]:
+    return [c.path, c.start_line, c.end_line]
 
-If found:
-Answer:
-- 1–3 sentences.
-- Include a 2–4 step flow (A -> B -> C) using names from PIPELINE HINTS / SYMBOL HINTS.
 
-Evidence:
-- Copy one or more lines from EVIDENCE CITATIONS exactly.
+async def _generate_session_answer(
+    repo_oid: ObjectId,
+    session_oid: ObjectId,
+    question: str,
+    history: List[Dict[str, str]],
+    k: int,
+    priority: Priority,
+) -> Dict[str, Any]:
+    """
+    Session turn that continues the model's own state (Ollama `context`) when
+    it is still valid (same model, same index generation, fits the budget):
+    the prompt then carries only evidence the model hasn't seen plus the
+    question, instead of re-prefilling instructions, evidence and history.
+    Anything else (first turn, fallback provider) sends the full prompt.
+    """
+    chunks, state = await asyncio.gather(
+        _evidence_chunks(repo_oid, question, k, priority),
+        load_llm_context(session_oid),
+    )
+    generation = await get_index_generation(repo_oid)
+    full = pack_prompt(question, chunks, history, budget=prompt_budget())
+
+    budget = settings.PROMPT_TOKEN_BUDGETS.get("ollama")
+    followup = None
+    known: List[List[Any]] = []
+    if (
+        state
+        and state.get("model") == settings.OLLAMA_MODEL
+        and state.get("generation") == generation
+        and budget
+    ):
+        known = state.get("evidence") or []
+        # the held context (earlier prompts + answers) counts against the
+        # model's window, not the per-prompt budget; leave room for the answer
+        window_left = settings.OLLAMA_NUM_CTX - len(state.get("context") or []) - settings.OLLAMA_ANSWER_TOKENS
+        free = min(budget, window_left)
+        new_chunks = [c for c in chunks if _chunk_key(c) not in known]
+        followup = pack_followup(question, new_chunks, len(known) + 1, free)
+
+    async with LLM_SCHEDULER.slot(priority):
+        gen = await LLM_ROUTER.generate(
+            full.prompt,
+            context=state.get("context") if followup else None,
+            context_prompt=followup.prompt if followup else None,
+        )
 
-Next checks:
-- 1–2 bullets referencing specific files or symbols.
+    if gen.used_context:
+        evidence = known + [_chunk_key(c) for c in followup.chunks]
+        usage = {**followup.usage, "reused_context_tokens": len(state["context"])}
+        sources = [
+            {"n": evidence.index(_chunk_key(c)) + 1, "path": c.path, "start_line": c.start_line,
+             "end_line": c.end_line, "score": c.score}
+            for c in chunks
+            if _chunk_key(c) in evidence
+        ]
+    else:
+        evidence = [_chunk_key(c) for c in full.chunks]
+        usage = full.usage
+        sources = format_sources(full.chunks)
+
+    if gen.provider == "ollama" and gen.context:
+        await save_llm_context(session_oid, {
+            "model": settings.OLLAMA_MODEL,
+            "generation": generation,
+            "context": gen.context,
+            "evidence": evidence,
+        })
+    elif state:
+        await save_llm_context(session_oid, None)  # this turn isn't in the old context
+
+    if gen.text.strip().startswith("Not found in this repository."):
+        sources = []
+    return {"answer": gen.text, "sources": sources, "prompt_usage": usage}
+
+
+async def _generate_within_deadline(
+    repo_oid: ObjectId,
+    question: str,
+    history: List[Dict[str, str]],
+    k: int,
+    deadline_ms: int,
+    priority: Priority,
+    session_oid: Optional[ObjectId],
+) -> Dict[str, Any]:
+    """
+    Answer planned to land within deadline_ms (see plan_answer): faster
+    provider, no reranking, no hints, fewer evidence chunks as needed. The generation is
+    streamed and stopped at the deadline, keeping the text that arrived
+    ("truncated"). Nothing is cached, and a session's model-side context is
+    dropped since this turn is not part of it.
+    """
+    deadline = Deadline(deadline_ms)
+    chain = LLM_ROUTER.candidates()
+    plan = plan_answer(deadline_ms, k, chain, {p: LLM_ROUTER.expected_latency_ms(p) for p in chain})
+
+    # same k as a prefetched retrieval
+    pending = [_evidence_chunks(repo_oid, question, k, priority, rerank_spans=plan.rerank)]
+    if session_oid is not None:
+        pending.append(save_llm_context(session_oid, None))
+    chunks = (await asyncio.gather(*pending))[0][: plan.k]
+    packed = pack_prompt(
+        question,
+        chunks,
+        history,
+        budget=settings.PROMPT_TOKEN_BUDGETS.get(plan.provider),
+        hints=plan.hints,
+    )
 
-If not found:
-Not found in this repository.
+    parts: List[str] = []
 
-Next checks:
-- 1–3 bullets with concrete files, folders, or keywords to search.
-"""
+    async def collect() -> None:
+        async with LLM_SCHEDULER.slot(priority):
+            pieces = LLM_ROUTER.stream(packed.prompt, prefer=plan.provider)
+            try:
+                async for piece in pieces:
+                    parts.append(piece)
+            finally:
+                await pieces.aclose()
 
-async def generate_answer(repo_oid: ObjectId, question: str, history: List[Dict[str, str]], k: int = 8) -> Dict[str, Any]:
-    chunks = await retrieve_chunks(repo_oid, question, k=k)
-    # Deduplicate overlaps
-    seen_text = set()
-    deduped = []
-    for c in chunks:
-        key = (c.path, c.start_line, c.end_line)  # cheap signature
-        if key in seen_text:
-            continue
-        seen_text.add(key)
-        deduped.append(c)
-    chunks = deduped[:k]    
+    degradations = list(plan.degradations)
+    try:
+        await asyncio.wait_for(collect(), timeout=max(0.0, deadline.remaining_ms() / 1000))
+    except asyncio.TimeoutError:
+        degradations.append("truncated" if parts else "deadline_exceeded")
 
-    prompt = build_prompt(question, chunks, history)
+    answer = "".join(parts).strip() or DEADLINE_EXCEEDED_ANSWER
+    sources = format_sources(packed.chunks)
+    if answer.startswith("Not found in this repository."):
+        sources = []
+    return {"answer": answer, "sources": sources, "prompt_usage": packed.usage, "degradations": degradations}
 
-    provider = (settings.LLM_PROVIDER or "auto").lower()
-    if provider not in ("auto", "gemini", "ollama", "local"):
-        provider = "auto"
 
-    if provider == "ollama":
-        answer = OllamaLLM(model=settings.OLLAMA_MODEL).generate(prompt)
-    elif provider == "local":
-        answer = LocalT5LLM().generate(prompt)
+async def _generate_answer(
+    repo_oid: ObjectId,
+    question: str,
+    history: List[Dict[str, str]],
+    k: int = 8,
+    llm_slots: asyncio.Semaphore | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> Dict[str, Any]:
+    packed = await prepare_answer(repo_oid, question, history, k=k, priority=priority)
+
+    if llm_slots is None:
+        async with LLM_SCHEDULER.slot(priority):
+            answer = await _call_llm(packed.prompt)
     else:
-        try:
-            answer = GeminiChatLLM().generate(prompt)
-        except (LLMRateLimitError, Exception):
-            # auto fallback OR if gemini fails and provider=auto
-            if provider == "gemini":
-                raise
-            if provider == "auto":
-                try:
-                    answer = OllamaLLM(model=settings.OLLAMA_MODEL).generate(prompt)
-                except Exception:
-                    answer = LocalT5LLM().generate(prompt)
-            else:
-                raise
+        async with llm_slots, LLM_SCHEDULER.slot(priority):
+            answer = await _call_llm(packed.prompt)
 
+    sources = format_sources(packed.chunks)
     if answer.strip().startswith("Not found in this repository."):
-        return {"answer": answer, "sources": []}
-    return {
-        "answer": answer,
-        "sources": [
-            {"n": i + 1, "path": c.path, "start_line": c.start_line, "end_line": c.end_line, "score": c.score}
-            for i, c in enumerate(chunks)
-        ],
-    }
-
-def _symbol_hints(chunks: List[RetrievedChunk]) -> str:
-    hints = []
-    for c in chunks:
-        if not c.path.lower().endswith(".py"):
-            continue
-        hits = extract_python_symbols(c.text)
-        for h in hits:
-            hints.append(f"- {h.kind}: `{h.name}` (from {c.path}:{c.start_line}-{c.end_line})")
-    # de-dupe while preserving order
-    seen = set()
-    out = []
-    for x in hints:
-        if x in seen:
-            continue
-        seen.add(x)
-        out.append(x)
-    return "\n".join(out[:12]) if out else "(none)"
-
-def _pipeline_hints(chunks: List[RetrievedChunk]) -> str:
-    items = []
-    for c in chunks:
-        if not c.path.lower().endswith(".py"):
-            continue
-        hints = extract_python_links(c.text)
-        for h in hints:
-            if h.kind == "calls":
-                items.append(f"- calls: `{h.name}()` (seen in {c.path}:{c.start_line}-{c.end_line})")
-            else:
-                items.append(f"- imports: `{h.name}` (seen in {c.path}:{c.start_line}-{c.end_line})")
-
-    # de-dupe preserve order
-    seen = set()
-    out = []
-    for x in items:
-        if x in seen:
-            continue
-        seen.add(x)
-        out.append(x)
-
-    out.sort(key=lambda s: _priority(s))
-    return "\n".join(out[:20]) if out else "(none)"
-
-def _priority(name: str) -> int:
-    n = name.lower()
-    if "ingest" in n:
-        return 0
-    if "embed" in n or "embedding" in n:
-        return 1
-    if "chunk" in n:
-        return 2
-    if "search" in n or "retrieve" in n:
-        return 3
-    return 9
+        sources = []
+    return {"answer": answer, "sources": sources, "prompt_usage": packed.usage}
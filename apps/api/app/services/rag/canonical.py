@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from loguru import logger
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.mongo import get_db
+from app.db.repos import CANONICAL_ANSWERS, get_index_generation
+from app.services.embeddings.query_embedder import embed_queries, embed_query
+from app.services.llm.scheduler import Priority
+from app.services.rag.answerer import generate_answer
+from app.services.rag.intent import classify_intent
+from app.services.retrieval.cache import normalize_question
+
+# (repo_id, index generation) -> stored canonical answers (possibly empty)
+_LOADED = TTLCache("canonical_answers", maxsize=1024, ttl_seconds=300)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(x * x for x in b))
+    if not na or not nb:
+        return 0.0
+    return sum(x * y for x, y in zip(a, b)) / (na * nb)
+
+
+async def pregenerate_answers(repo_id: ObjectId, generation: int) -> Dict[str, Any]:
+    """
+    Optional ingestion stage (PREGENERATE_ANSWERS): answer CANONICAL_QUESTIONS
+    for the new index generation at background priority and store each answer
+    with its sources, intent and question embedding. Older generations'
+    answers are removed once the new ones are in.
+    """
+    questions = [q for q in settings.CANONICAL_QUESTIONS if q.strip()]
+    if not questions:
+        return {"canonical_answers": 0}
+
+    db = get_db()
+    try:
+        vectors: List[Optional[List[float]]] = list(await embed_queries(questions, Priority.BACKGROUND))
+    except Exception as exc:
+        logger.warning("embedding canonical questions failed: {}", exc)
+        vectors = [None] * len(questions)
+
+    stored = 0
+    for question, vector in zip(questions, vectors):
+        try:
+            rag = await generate_answer(repo_id, question, history=[], priority=Priority.BACKGROUND)
+        except Exception as exc:
+            logger.warning("canonical answer for {!r} failed: {}", question, exc)
+            continue
+        if not rag["sources"]:
+            continue  # "Not found" isn't worth serving instantly
+        normalized = normalize_question(question)
+        await db[CANONICAL_ANSWERS].update_one(
+            {"repo_id": repo_id, "generation": generation, "normalized": normalized},
+            {"$set": {
+                "question": question,
+                "intent": classify_intent(question),
+                "vector": vector,
+                "answer": rag["answer"],
+                "sources": rag["sources"],
+                "prompt_usage": rag.get("prompt_usage"),
+                "created_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+        stored += 1
+
+    await db[CANONICAL_ANSWERS].delete_many({"repo_id": repo_id, "generation": {"$lt": generation}})
+    _LOADED.invalidate(lambda key: key[0] == str(repo_id))
+    return {"canonical_answers": stored}
+
+
+async def _load(repo_id: ObjectId, generation: int) -> List[Dict[str, Any]]:
+    key = (str(repo_id), generation)
+    docs = _LOADED.get(key)
+    if docs is None:
+        db = get_db()
+        docs = await db[CANONICAL_ANSWERS].find(
+            {"repo_id": repo_id, "generation": generation},
+            {"_id": 0, "normalized": 1, "intent": 1, "vector": 1, "answer": 1, "sources": 1, "prompt_usage": 1},
+        ).to_list(length=None)
+        _LOADED.set(key, docs)
+    return docs
+
+
+async def match_canonical(
+    repo_id: ObjectId,
+    question: str,
+    priority: Priority = Priority.INTERACTIVE,
+) -> Optional[Dict[str, Any]]:
+    """
+    Stored answer for a question that is one of the repo's canonical questions:
+    the same normalized text, or the same intent with question embeddings at
+    least CANONICAL_MATCH_SIMILARITY apart. None when disabled or no match.
+    """
+    if not settings.PREGENERATE_ANSWERS:
+        return None
+    docs = await _load(repo_id, await get_index_generation(repo_id))
+    if not docs:
+        return None
+
+    normalized = normalize_question(question)
+    match = next((d for d in docs if d["normalized"] == normalized), None)
+    if match is None:
+        intent = classify_intent(question)
+        candidates = [d for d in docs if d["intent"] == intent and d.get("vector")]
+        if not candidates:
+            return None
+        try:
+            vector = await embed_query(question, priority)  # shared with retrieval (cache / in flight)
+        except Exception:
+            return None
+        score, best = max(((_cosine(vector, d["vector"]), d) for d in candidates), key=lambda t: t[0])
+        if score < settings.CANONICAL_MATCH_SIMILARITY:
+            return None
+        match = best
+    return {"answer": match["answer"], "sources": match["sources"], "prompt_usage": match.get("prompt_usage")}
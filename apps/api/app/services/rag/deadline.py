@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.core.config import settings
+
+# share of the generation budget the chosen provider is expected to use
+# before prompt-side degradations kick in
+HINTS_PRESSURE = 0.5
+TOP_K_PRESSURE = 0.75
+MIN_TOP_K = 2
+
+
+@dataclass
+class Deadline:
+    budget_ms: float
+    started: float = field(default_factory=time.monotonic)
+
+    def remaining_ms(self) -> float:
+        return self.budget_ms - (time.monotonic() - self.started) * 1000
+
+
+@dataclass
+class AnswerPlan:
+    k: int
+    provider: str
+    hints: bool = True
+    rerank: bool = True
+    degradations: List[str] = field(default_factory=list)
+
+
+def plan_answer(budget_ms: float, k: int, chain: List[str], expected_ms: Dict[str, float]) -> AnswerPlan:
+    """
+    Fit an answer into budget_ms (retrieval + generation), cheapest loss first:
+    1. a faster provider tier when the preferred one is expected to overrun
+    2. no reranking (RERANKER_MODEL) when generation leaves under DEADLINE_RERANK_MS
+    3. no pipeline/symbol hints when generation is expected to use over half the budget
+    4. half the evidence chunks (top_k) above three quarters
+    Generation is still cut off at the deadline (see answerer), keeping partial output.
+    Degradations are reported as "provider:<name>", "no_rerank", "no_hints", "top_k:<n>".
+    """
+    plan = AnswerPlan(k=k, provider=chain[0])
+    llm_budget = max(1.0, budget_ms - settings.DEADLINE_RETRIEVAL_MS)
+
+    if expected_ms[plan.provider] > llm_budget:
+        fitting = [p for p in chain if expected_ms[p] <= llm_budget]
+        faster = fitting[0] if fitting else min(chain, key=lambda p: expected_ms[p])
+        if faster != plan.provider:
+            plan.provider = faster
+            plan.degradations.append(f"provider:{faster}")
+
+    if settings.RERANKER_MODEL and llm_budget - expected_ms[plan.provider] < settings.DEADLINE_RERANK_MS:
+        plan.rerank = False
+        plan.degradations.append("no_rerank")
+
+    pressure = expected_ms[plan.provider] / llm_budget
+    if pressure > HINTS_PRESSURE:
+        plan.hints = False
+        plan.degradations.append("no_hints")
+    if pressure > TOP_K_PRESSURE and k > MIN_TOP_K:
+        plan.k = max(MIN_TOP_K, k // 2)
+        plan.degradations.append(f"top_k:{plan.k}")
+    return plan
+
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from loguru import logger
+
+from app.core.config import settings
+from app.db.mongo import get_db
+from app.services.llm.router import LLM_ROUTER
+from app.services.llm.scheduler import LLM_SCHEDULER, Priority
+
+SESSIONS = "chat_sessions"
+MESSAGES = "chat_messages"
+
+# messages kept verbatim after the summary: the last user/assistant turn
+VERBATIM_MESSAGES = 2
+
+
+async def recent_messages(session_oid: ObjectId) -> List[Dict[str, Any]]:
+    """
+    Last CHAT_HISTORY_MAX_TURNS turns of a session, oldest first. Doesn't need
+    the session document, so it can run concurrently with loading it.
+    """
+    db = get_db()
+    limit = settings.CHAT_HISTORY_MAX_TURNS * 2
+    cursor = db[MESSAGES].find(
+        {"session_id": session_oid},
+        projection={"role": 1, "content": 1, "created_at": 1, "_id": 0},
+    ).sort("created_at", -1).limit(limit)
+    msgs = await cursor.to_list(length=limit)
+    msgs.reverse()
+    return msgs
+
+
+def history_from(session: Dict[str, Any], msgs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Prompt history for a session:
+    - the rolling summary (role "summary") of everything up to summary_upto
+    - the messages after it verbatim (normally the last turn), capped at
+      CHAT_HISTORY_MAX_TURNS turns in case summarizing lags behind
+    """
+    upto = session.get("summary_upto")
+    history = [
+        {"role": m["role"], "content": m["content"]}
+        for m in msgs
+        if not upto or m["created_at"] > upto
+    ]
+    if session.get("summary"):
+        history.insert(0, {"role": "summary", "content": session["summary"]})
+    return history
+
+
+def summary_prompt(summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+    turns = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    return f"""You maintain the running summary of a conversation about a code repository.
+Merge the NEW MESSAGES into the CURRENT SUMMARY. Keep file paths, symbol names,
+what the user asked about and what was concluded. Drop greetings and formatting.
+Reply with the updated summary only, at most {settings.CHAT_SUMMARY_MAX_WORDS} words.
+
+CURRENT SUMMARY:
+{summary or "(none)"}
+
+NEW MESSAGES:
+{turns}
+"""
+
+
+async def update_session_summary(session_oid: ObjectId) -> None:
+    """
+    Background step after each turn: fold every message except the last turn
+    into the session's summary. The write only lands if no other update moved
+    summary_upto in the meantime.
+    """
+    db = get_db()
+    session = await db[SESSIONS].find_one({"_id": session_oid}, {"summary": 1, "summary_upto": 1})
+    if not session:
+        return
+
+    query: Dict[str, Any] = {"session_id": session_oid}
+    if session.get("summary_upto"):
+        query["created_at"] = {"$gt": session["summary_upto"]}
+    msgs = await db[MESSAGES].find(
+        query,
+        projection={"role": 1, "content": 1, "created_at": 1, "_id": 0},
+    ).sort("created_at", 1).to_list(length=None)
+
+    fold = msgs[:-VERBATIM_MESSAGES]
+    if not fold:
+        return
+
+    try:
+        async with LLM_SCHEDULER.slot(Priority.BACKGROUND):
+            generation = await LLM_ROUTER.generate(summary_prompt(session.get("summary"), fold))
+    except Exception as exc:
+        # history falls back to the capped verbatim messages
+        logger.warning("session summary failed for {}: {}", session_oid, exc)
+        return
+
+    summary = generation.text.strip()[: settings.CHAT_SUMMARY_MAX_WORDS * 10]
+    if not summary:
+        return
+    await db[SESSIONS].update_one(
+        {"_id": session_oid, "summary_upto": session.get("summary_upto")},
+        {"$set": {"summary": summary, "summary_upto": fold[-1]["created_at"]}},
+    )
+
+
+async def load_llm_context(session_oid: ObjectId) -> Optional[Dict[str, Any]]:
+    """
+    Model-side state of a session's conversation (Ollama `context`):
+    {"model", "generation", "context": [token ids], "evidence": [[path, start, end], ...]}
+    evidence lists the chunks already in that context, in citation order.
+    """
+    db = get_db()
+    doc = await db[SESSIONS].find_one({"_id": session_oid}, {"llm_context": 1})
+    return (doc or {}).get("llm_context")
+
+
+async def save_llm_context(session_oid: ObjectId, state: Optional[Dict[str, Any]]) -> None:
+    db = get_db()
+    if state is None:
+        await db[SESSIONS].update_one({"_id": session_oid}, {"$unset": {"llm_context": ""}})
+        return
+    await db[SESSIONS].update_one(
+        {"_id": session_oid},
+        {"$set": {"llm_context": {**state, "updated_at": datetime.utcnow()}}},
+    )
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.services.rag.links import extract_python_links
+from app.services.rag.symbols import extract_python_symbols
+
+if TYPE_CHECKING:
+    from app.services.rag.answerer import RetrievedChunk
+
+# rough chars/token for code-heavy prompts (no tokenizer dependency)
+CHARS_PER_TOKEN = 3.5
+# share of the free budget kept for chat history before evidence is packed
+HISTORY_SHARE = 0.2
+MAX_PIPELINE_HINTS = 20
+MAX_SYMBOL_HINTS = 12
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+@dataclass
+class PackedPrompt:
+    prompt: str
+    chunks: List["RetrievedChunk"]  # evidence actually in the prompt, citation order
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+
+def _format_chunk(n: int, c: "RetrievedChunk") -> str:
+    return f"[{n}] {c.path}:{c.start_line}-{c.end_line}\n```text\n{c.text}\n```"
+
+
+def _citation(n: int, c: "RetrievedChunk") -> str:
+    return f"[{n}] {c.path}:{c.start_line}-{c.end_line}"
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    seen = set()
+    out = []
+    for x in items:
+        if x in seen:
+            continue
+        seen.add(x)
+        out.append(x)
+    return out
+
+
+def symbol_hint_lines(chunks: List["RetrievedChunk"]) -> List[str]:
+    hints = []
+    for c in chunks:
+        if not c.path.lower().endswith(".py"):
+            continue
+        for h in extract_python_symbols(c.text):
+            hints.append(f"- {h.kind}: `{h.name}` (from {c.path}:{c.start_line}-{c.end_line})")
+    return _dedupe(hints)[:MAX_SYMBOL_HINTS]
+
+
+def _priority(name: str) -> int:
+    n = name.lower()
+    if "ingest" in n:
+        return 0
+    if "embed" in n or "embedding" in n:
+        return 1
+    if "chunk" in n:
+        return 2
+    if "search" in n or "retrieve" in n:
+        return 3
+    return 9
+
+
+def pipeline_hint_lines(chunks: List["RetrievedChunk"]) -> List[str]:
+    items = []
+    for c in chunks:
+        if not c.path.lower().endswith(".py"):
+            continue
+        for h in extract_python_links(c.text):
+            if h.kind == "calls":
+                items.append(f"- calls: `{h.name}()` (seen in {c.path}:{c.start_line}-{c.end_line})")
+            else:
+                items.append(f"- imports: `{h.name}` (seen in {c.path}:{c.start_line}-{c.end_line})")
+    out = _dedupe(items)
+    out.sort(key=lambda s: _priority(s))
+    return out[:MAX_PIPELINE_HINTS]
+
+
+SYSTEM_PREFIX = """SYSTEM:
+You are a senior software engineer.
+Use ONLY the CODE CONTEXT. Do not guess.
+
+If the CODE CONTEXT does not contain enough information to answer, reply exactly:
+Not found in this repository.
+
+RESPONSE FORMAT (follow strictly):
+
+If found:
+Answer:
+- 1–3 sentences.
+- Include a 2–4 step flow (A -> B -> C) using names from PIPELINE HINTS / SYMBOL HINTS.
+
+Evidence:
+- Copy one or more lines from EVIDENCE CITATIONS exactly.
+
+Next checks:
+- 1–2 bullets referencing specific files or symbols.
+
+If not found:
+Not found in this repository.
+
+Next checks:
+- 1–3 bullets with concrete files, folders, or keywords to search.
+"""
+
+
+def render_parts(
+    question: str,
+    history_lines: List[str],
+    chunks: List["RetrievedChunk"],
+    pipeline_hints: List[str],
+    symbol_hints: List[str],
+) -> tuple[str, str]:
+    """
+    (prefix, suffix). The prefix holds what stays fixed for a set of evidence
+    (instructions, format, evidence, hints) so the model server can reuse its
+    prefill; what changes every turn (history, question) goes last.
+    """
+    history_text = "\n".join(history_lines)
+    context = "\n\n".join(_format_chunk(i, c) for i, c in enumerate(chunks, start=1))
+    evidence_refs = "\n".join(_citation(i, c) for i, c in enumerate(chunks, start=1))
+
+    prefix = f"""{SYSTEM_PREFIX}
+EVIDENCE REFERENCES (verbatim excerpts from the repository):
+{context if context else "(no relevant context found)"}
+
+EVIDENCE CITATIONS (copy EXACTLY; do not invent):
+{evidence_refs if evidence_refs else "(none)"}
+
+PIPELINE HINTS (use these to explain "what calls what"; do not invent names):
+{chr(10).join(pipeline_hints) if pipeline_hints else "(none)"}
+
+SYMBOL HINTS (use these names if relevant; do not invent new names):
+{chr(10).join(symbol_hints) if symbol_hints else "(none)"}
+"""
+    suffix = f"""
+CHAT HISTORY:
+{history_text if history_text else "(none)"}
+
+QUESTION:
+{question}
+"""
+    return prefix, suffix
+
+
+def render_prompt(
+    question: str,
+    history_lines: List[str],
+    chunks: List["RetrievedChunk"],
+    pipeline_hints: List[str],
+    symbol_hints: List[str],
+) -> str:
+    prefix, suffix = render_parts(question, history_lines, chunks, pipeline_hints, symbol_hints)
+    return prefix + suffix
+
+
+def _chunk_cost(n: int, c: "RetrievedChunk") -> int:
+    return estimate_tokens(_format_chunk(n, c)) + estimate_tokens(_citation(n, c)) + 1
+
+
+def _truncate_chunk(n: int, c: "RetrievedChunk", budget: int) -> Optional["RetrievedChunk"]:
+    """Leading lines of a chunk that fit the budget (line span adjusted), or None."""
+    lines = c.text.splitlines()
+    keep = len(lines)
+    while keep > 0:
+        cut = replace(c, text="\n".join(lines[:keep]), end_line=c.start_line + keep - 1)
+        if _chunk_cost(n, cut) <= budget:
+            return cut
+        # shrink proportionally, at least one line per step
+        keep = min(keep - 1, int(keep * budget / max(1, _chunk_cost(n, cut))))
+    return None
+
+
+def _fill(lines: List[str], budget: int) -> tuple[List[str], int]:
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            continue
+        kept.append(line)
+        used += cost
+    return kept, used
+
+
+def pack_prompt(
+    question: str,
+    chunks: List["RetrievedChunk"],
+    history: List[Dict[str, str]],
+    budget: Optional[int] = None,
+    hints: bool = True,
+) -> PackedPrompt:
+    """
+    Assemble the answer prompt within an estimated token budget.
+    Fill order once instructions + question are in:
+    1. evidence chunks in rank order (the top chunk is cut to fit rather than dropped),
+       keeping HISTORY_SHARE of the free budget back for history
+    2. chat history, newest messages first
+    3. pipeline hints, then symbol hints (from the evidence that made it in)
+    budget=None packs everything (hint caps still apply).
+    hints=False leaves both hint sections out (and skips extracting them).
+    """
+    history_lines = [f"{m['role'].upper()}: {m['content']}" for m in history]
+
+    if budget is None:
+        kept_chunks, kept_history = list(chunks), history_lines
+        pipeline = pipeline_hint_lines(kept_chunks) if hints else []
+        symbols = symbol_hint_lines(kept_chunks) if hints else []
+    else:
+        overhead = estimate_tokens(render_prompt(question, [], [], [], []))
+        free = max(0, budget - overhead)
+        history_cost = sum(estimate_tokens(line) + 1 for line in history_lines)
+        evidence_budget = free - min(history_cost, int(free * HISTORY_SHARE))
+
+        kept_chunks = []
+        used = 0
+        for c in chunks:
+            n = len(kept_chunks) + 1
+            cost = _chunk_cost(n, c)
+            if used + cost > evidence_budget:
+                if kept_chunks:
+                    continue
+                c = _truncate_chunk(n, c, evidence_budget - used)
+                if c is None:
+                    continue
+                cost = _chunk_cost(n, c)
+            kept_chunks.append(c)
+            used += cost
+        free -= used
+
+        newest_first, used = _fill(list(reversed(history_lines)), free)
+        kept_history = list(reversed(newest_first))
+        free -= used
+
+        pipeline, used = _fill(pipeline_hint_lines(kept_chunks) if hints else [], free)
+        free -= used
+        symbols, _ = _fill(symbol_hint_lines(kept_chunks) if hints else [], free)
+
+    prompt = render_prompt(question, kept_history, kept_chunks, pipeline, symbols)
+    usage = {
+        "budget": budget,
+        "estimated_tokens": estimate_tokens(prompt),
+        "sections": {
+            "question": estimate_tokens(question),
+            "history": estimate_tokens("\n".join(kept_history)),
+            "evidence": sum(_chunk_cost(i, c) for i, c in enumerate(kept_chunks, start=1)),
+            "pipeline_hints": estimate_tokens("\n".join(pipeline)),
+            "symbol_hints": estimate_tokens("\n".join(symbols)),
+        },
+        "dropped": {
+            "chunks": len(chunks) - len(kept_chunks),
+            "history_messages": len(history_lines) - len(kept_history),
+        },
+    }
+    usage["sections"]["instructions"] = usage["estimated_tokens"] - sum(usage["sections"].values())
+    return PackedPrompt(prompt=prompt, chunks=kept_chunks, usage=usage)
+
+
+def pack_followup(
+    question: str,
+    new_chunks: List["RetrievedChunk"],
+    first_number: int,
+    budget: int,
+) -> Optional[PackedPrompt]:
+    """
+    Follow-up prompt for a model that already holds the session's earlier
+    prompts and answers (Ollama `context`): only evidence it hasn't seen yet
+    (numbered from first_number on) and the question. None if it doesn't fit.
+    """
+    kept: List["RetrievedChunk"] = []
+    blocks: List[str] = []
+    used = estimate_tokens(question) + 60  # headings
+    for c in new_chunks:
+        n = first_number + len(kept)
+        cost = _chunk_cost(n, c)
+        if used + cost > budget:
+            continue
+        kept.append(c)
+        blocks.append(_format_chunk(n, c))
+        used += cost
+    if used > budget:
+        return None
+
+    refs = "\n".join(_citation(first_number + i, c) for i, c in enumerate(kept))
+    prompt = f"""FOLLOW-UP (same SYSTEM rules and RESPONSE FORMAT as above; cite any [n] from this conversation).
+
+NEW EVIDENCE REFERENCES:
+{chr(10).join(blocks) if blocks else "(none; use the evidence above)"}
+
+NEW EVIDENCE CITATIONS (copy EXACTLY; do not invent):
+{refs if refs else "(none)"}
+
+QUESTION:
+{question}
+"""
+    usage = {
+        "budget": budget,
+        "estimated_tokens": estimate_tokens(prompt),
+        "sections": {
+            "question": estimate_tokens(question),
+            "evidence": sum(_chunk_cost(first_number + i, c) for i, c in enumerate(kept)),
+        },
+        "dropped": {"chunks": len(new_chunks) - len(kept)},
+    }
+    return PackedPrompt(prompt=prompt, chunks=kept, usage=usage)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Hashable, List, Tuple
+
+from loguru import logger
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.retrieval.cache import normalize_question
+
+if TYPE_CHECKING:
+    from app.services.rag.answerer import RetrievedChunk
+
+# torch / transformers are imported on first use, like the local LLM
+
+MAX_PAIR_TOKENS = 512
+
+# (model, normalized question, path, start, end, text digest) -> relevance score
+SCORE_CACHE = TTLCache(
+    "rerank_scores",
+    maxsize=settings.RERANK_CACHE_SIZE,
+    ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+)
+
+# one CPU inference at a time; torch parallelizes each batch across cores
+# (its process-wide thread count is left alone here)
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+
+@lru_cache(maxsize=1)
+def _load_model():
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    started = time.monotonic()
+    tok = AutoTokenizer.from_pretrained(settings.RERANKER_MODEL)
+    model = AutoModelForSequenceClassification.from_pretrained(settings.RERANKER_MODEL)
+    model.eval()
+    logger.info("Reranker {} loaded in {:.1f}s", settings.RERANKER_MODEL, time.monotonic() - started)
+    return tok, model
+
+
+def _score_batch_sync(pairs: List[Tuple[str, str]]) -> List[float]:
+    """Relevance of each (question, passage) pair, one padded forward pass."""
+    import torch
+
+    tok, model = _load_model()
+    inputs = tok(
+        [q for q, _ in pairs],
+        [p for _, p in pairs],
+        return_tensors="pt",
+        padding=True,
+        truncation="only_second",
+        max_length=MAX_PAIR_TOKENS,
+    )
+    with torch.no_grad():
+        logits = model(**inputs).logits
+    # single-logit models score directly; two-label ones use the "relevant" logit
+    scores = logits.view(-1) if logits.shape[-1] == 1 else logits[:, -1]
+    return [float(s) for s in scores]
+
+
+def _score_key(question: str, c: "RetrievedChunk") -> Hashable:
+    digest = hashlib.blake2b(c.text.encode("utf-8"), digest_size=8).hexdigest()
+    return (settings.RERANKER_MODEL, normalize_question(question), c.path, c.start_line, c.end_line, digest)
+
+
+async def rerank(question: str, chunks: List["RetrievedChunk"], top_n: int) -> List["RetrievedChunk"]:
+    """
+    Cross-encoder reranking (RERANKER_MODEL, CPU): the top_n chunks by
+    (question, chunk) relevance. Uncached pairs are scored in one batch on
+    the reranker executor. Disabled, or if scoring fails: chunks unchanged.
+    """
+    if not settings.RERANKER_MODEL or not chunks:
+        return chunks
+
+    keys = [_score_key(question, c) for c in chunks]
+    scores = [SCORE_CACHE.get(key) for key in keys]
+    missing = [i for i, s in enumerate(scores) if s is None]
+    if missing:
+        loop = asyncio.get_running_loop()
+        try:
+            fresh = await loop.run_in_executor(
+                _EXECUTOR, _score_batch_sync, [(question, chunks[i].text) for i in missing]
+            )
+        except Exception as exc:
+            logger.warning("reranking failed, keeping retrieval order: {}", exc)
+            return chunks
+        for i, score in zip(missing, fresh):
+            scores[i] = score
+            SCORE_CACHE.set(keys[i], score)
+
+    # stable on ties, so equal scores keep the retrieval order
+    order = sorted(range(len(chunks)), key=lambda i: -scores[i])
+    return [chunks[i] for i in order[: max(1, top_n)]]
+
+
+async def warm_up() -> None:
+    """Load the reranker (and score one pair) off the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_EXECUTOR, _score_batch_sync, [("warm up", "warm up")])
+    except Exception as exc:
+        logger.warning("Reranker warm-up failed: {}", exc)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from app.services.rag.answerer import RetrievedChunk
+
+
+def _overlap_lines(a_lines: List[str], b_lines: List[str], max_overlap: int) -> int:
+    """
+    How many leading lines of b repeat the tail of a.
+    Chunk texts are strip()ed, so line numbers alone can be off by the blank
+    lines trimmed at the edges; compare (stripped) content within the span overlap.
+    """
+    for m in range(min(max_overlap, len(a_lines), len(b_lines)), 0, -1):
+        if [x.strip() for x in a_lines[-m:]] == [x.strip() for x in b_lines[:m]]:
+            return m
+    return 0
+
+
+def _join(a: "RetrievedChunk", b: "RetrievedChunk") -> "RetrievedChunk":
+    """Merge b (starting at or before a.end_line + 1) into a."""
+    if b.end_line <= a.end_line:
+        return replace(a, score=max(a.score, b.score))  # b is inside a
+    a_lines, b_lines = a.text.splitlines(), b.text.splitlines()
+    m = _overlap_lines(a_lines, b_lines, a.end_line - b.start_line + 1)
+    return replace(
+        a,
+        text="\n".join(a_lines + b_lines[m:]),
+        end_line=b.end_line,
+        score=max(a.score, b.score),
+    )
+
+
+def merge_chunks(chunks: List["RetrievedChunk"]) -> List["RetrievedChunk"]:
+    """
+    Coalesce overlapping/adjacent chunks of the same file into contiguous spans.
+    - each line appears once (chunker overlap and exact duplicates removed)
+    - a span's score is the best of its members
+    - spans keep the rank of their best-ranked member, so citations [n]
+      number the merged spans in retrieval order
+    """
+    by_path: Dict[str, List[int]] = {}
+    for i, c in enumerate(chunks):
+        by_path.setdefault(c.path, []).append(i)
+
+    spans: List[tuple[int, "RetrievedChunk"]] = []  # (best rank, span)
+    for idxs in by_path.values():
+        idxs.sort(key=lambda i: (chunks[i].start_line, chunks[i].end_line))
+        rank, cur = idxs[0], chunks[idxs[0]]
+        for i in idxs[1:]:
+            c = chunks[i]
+            if c.start_line <= cur.end_line + 1:
+                cur = _join(cur, c)
+                rank = min(rank, i)
+            else:
+                spans.append((rank, cur))
+                rank, cur = i, c
+        spans.append((rank, cur))
+
+    spans.sort(key=lambda s: s[0])
+    return [span for _, span in spans]
@@ -7,16 +7,18 @@ from typing import List, Optional
 
 @dataclass
 class SymbolHit:
-    kind: str  # "function" | "class"
+    kind: str  # "function" | "method" | "class"
     name: str
     lineno: int
     end_lineno: Optional[int]
+    qualname: Optional[str] = None  # e.g. "GitHubClient.get_tree"
 
 
 def extract_python_symbols(code: str) -> List[SymbolHit]:
     """
     Best-effort symbol extraction from a Python snippet.
     Works even if snippet is not a full file (may fail -> returns []).
+    Functions defined directly in a class body are reported as methods.
     """
     try:
         tree = ast.parse(code)
@@ -24,32 +26,26 @@ def extract_python_symbols(code: str) -> List[SymbolHit]:
         return []
 
     hits: List[SymbolHit] = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            hits.append(
-                SymbolHit(
-                    kind="function",
-                    name=node.name,
-                    lineno=getattr(node, "lineno", 0) or 0,
-                    end_lineno=getattr(node, "end_lineno", None),
-                )
-            )
-        elif isinstance(node, ast.AsyncFunctionDef):
-            hits.append(
-                SymbolHit(
-                    kind="function",
-                    name=node.name,
-                    lineno=getattr(node, "lineno", 0) or 0,
-                    end_lineno=getattr(node, "end_lineno", None),
-                )
-            )
-        elif isinstance(node, ast.ClassDef):
-            hits.append(
-                SymbolHit(
-                    kind="class",
-                    name=node.name,
-                    lineno=getattr(node, "lineno", 0) or 0,
-                    end_lineno=getattr(node, "end_lineno", None),
+
+    def visit(node: ast.AST, scope: List[str], in_class: bool) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if isinstance(child, ast.ClassDef):
+                    kind = "class"
+                else:
+                    kind = "method" if in_class else "function"
+                hits.append(
+                    SymbolHit(
+                        kind=kind,
+                        name=child.name,
+                        lineno=getattr(child, "lineno", 0) or 0,
+                        end_lineno=getattr(child, "end_lineno", None),
+                        qualname=".".join([*scope, child.name]),
+                    )
                 )
-            )
-    return hits
\ No newline at end of file
+                visit(child, [*scope, child.name], kind == "class")
+            else:
+                visit(child, scope, in_class)
+
+    visit(tree, [], False)
+    return hits
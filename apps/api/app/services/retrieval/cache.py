@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import re
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# (embedding model, normalized question) -> query vector
+EMBEDDING_CACHE = TTLCache(
+    "query_embeddings",
+    maxsize=settings.EMBED_CACHE_SIZE,
+    ttl_seconds=settings.EMBED_CACHE_TTL_SECONDS,
+)
+
+# (repo_id, index generation, normalized question, k) -> List[RetrievedChunk]
+RETRIEVAL_CACHE = TTLCache(
+    "retrieval_results",
+    maxsize=settings.RETRIEVAL_CACHE_SIZE,
+    ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+)
+
+
+def normalize_question(question: str) -> str:
+    q = re.sub(r"\s+", " ", question.strip().lower())
+    return q.rstrip("?!. ")
+
+
+def invalidate_repo(repo_id) -> None:
+    """
+    Drop cached retrieval results for a repo (called when ingestion finishes).
+    Keys also carry the index generation, which other workers read through
+    REPO_STATUS_CACHE: they switch to the new generation within
+    REPO_STATUS_TTL_SECONDS and may serve the previous one's results until then.
+    """
+    rid = str(repo_id)
+    RETRIEVAL_CACHE.invalidate(lambda key: key[0] == rid)
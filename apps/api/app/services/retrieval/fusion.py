@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Dict[str, Any]]],
+    *,
+    key: Callable[[Dict[str, Any]], Hashable],
+    k: int = RRF_K,
+) -> List[Dict[str, Any]]:
+    """
+    Fuse several ranked result lists with reciprocal-rank fusion.
+    - each row contributes 1 / (k + rank) per list it appears in
+    - raw leg scores are ignored, so vector and lexical legs are comparable
+    - returns rows (first occurrence wins) with "score" set to the fused score
+    """
+    fused: Dict[Hashable, float] = {}
+    rows: Dict[Hashable, Dict[str, Any]] = {}
+
+    for ranked in ranked_lists:
+        for rank, row in enumerate(ranked, start=1):
+            rk = key(row)
+            fused[rk] = fused.get(rk, 0.0) + 1.0 / (k + rank)
+            if rk not in rows:
+                rows[rk] = row
+
+    order = sorted(fused, key=lambda rk: fused[rk], reverse=True)
+    return [{**rows[rk], "score": fused[rk]} for rk in order]
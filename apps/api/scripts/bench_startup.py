@@ -0,0 +1,92 @@
+"""
+Startup import-cost benchmark for the API.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports wall time, peak RSS and the most expensive imports (cumulative).
+
+    cd apps/api
+    python scripts/bench_startup.py                 # import app.main, 3 runs
+    python scripts/bench_startup.py --top 30 --runs 5
+    python scripts/bench_startup.py --module app.services.rag.answerer
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+API_DIR = Path(__file__).resolve().parents[1]
+LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_once(module: str) -> Tuple[float, float, Dict[str, Tuple[int, int]]]:
+    """(wall seconds, child peak RSS MB, {module: (self us, cumulative us)})."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        sys.exit(proc.stderr[-2000:])
+    # ru_maxrss is the max over all waited-for children (KB on Linux)
+    rss_mb = max(before, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return wall, rss_mb, modules
+
+
+def top_level(name: str) -> str:
+    return name.split(".")[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    walls: List[float] = []
+    last: Dict[str, Tuple[int, int]] = {}
+    rss = 0.0
+    for _ in range(max(1, args.runs)):
+        wall, rss_mb, last = run_once(args.module)
+        walls.append(wall)
+        rss = max(rss, rss_mb)
+
+    print(f"import {args.module}: median {statistics.median(walls):.2f}s over {len(walls)} runs, peak RSS {rss:.0f} MB")
+
+    heavy = {"torch", "transformers", "google", "numpy"}
+    loaded = sorted({top_level(n) for n in last} & heavy)
+    print(f"heavy packages loaded: {', '.join(loaded) or '(none)'}")
+
+    packages: Dict[str, int] = {}
+    for name, (self_us, _) in last.items():
+        packages[top_level(name)] = packages.get(top_level(name), 0) + self_us
+    print(f"\n{'self ms':>9}  top-level package")
+    for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"{us / 1000:9.1f}  {name}")
+
+    print(f"\n{'cum ms':>9}  module")
+    for name, (_, cum) in sorted(last.items(), key=lambda kv: -kv[1][1])[: args.top]:
+        print(f"{cum / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+
+from app.core import cache
+
+
+@pytest.fixture(autouse=True)
+def _restore_cache_registry():
+    """TTLCaches built by a test (or an AnswerCache's "answers") must not replace the app's registered caches."""
+    registered = dict(cache._REGISTRY)
+    yield
+    cache._REGISTRY.clear()
+    cache._REGISTRY.update(registered)
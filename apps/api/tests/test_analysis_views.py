@@ -0,0 +1,77 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.services.analysis import views
+
+OVERVIEW = {
+    "components": [{"name": "API", "files": ["app/main.py"]}],
+    "tech_stack": ["FastAPI"],
+    "data_flow": views.DATA_FLOW,
+    "confidence": "high",
+    "summary": None,
+}
+
+
+class FakeAnalysis:
+    def __init__(self, doc):
+        self.doc = doc
+
+    async def find_one(self, query, projection=None, sort=None):
+        return self.doc
+
+    async def update_one(self, query, update, upsert=False):
+        for field, value in update.get("$set", {}).items():
+            target = self.doc
+            *parents, leaf = field.split(".")
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = value
+
+
+def test_missing_summary_is_filled_in_the_background_once(monkeypatch):
+    repo_id = ObjectId()
+    analysis = FakeAnalysis({"repo_id": repo_id, "generation": 3, "overview": dict(OVERVIEW)})
+    monkeypatch.setattr(views, "get_db", lambda: {views.REPO_ANALYSIS: analysis})
+    release = asyncio.Event()
+    calls = []
+
+    async def summarize(overview):
+        calls.append(overview)
+        await release.wait()
+        return "A FastAPI service."
+
+    monkeypatch.setattr(views, "_summarize", summarize)
+
+    async def main():
+        first = await views.get_analysis_view(repo_id, "overview")
+        second = await views.get_analysis_view(repo_id, "overview")
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*views._SUMMARY_TASKS.values())
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first["summary_status"] == second["summary_status"] == "pending"
+    assert len(calls) == 1
+    assert analysis.doc["overview"]["summary"] == "A FastAPI service."
+    assert "summary_status" not in analysis.doc["overview"]
+    assert not views._SUMMARY_TASKS
+
+
+def test_unindexed_repo_gets_no_view_and_nothing_is_stored(monkeypatch):
+    writes = []
+
+    class Empty(FakeAnalysis):
+        async def update_one(self, query, update, upsert=False):
+            writes.append(query)
+
+    async def status(repo_id):
+        return {"indexed": False, "generation": 0}
+
+    monkeypatch.setattr(views, "get_db", lambda: {views.REPO_ANALYSIS: Empty(None)})
+    monkeypatch.setattr(views, "get_repo_status", status)
+
+    assert asyncio.run(views.get_analysis_view(ObjectId(), "entrypoints")) is None
+    assert writes == []
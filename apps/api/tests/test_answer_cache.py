@@ -0,0 +1,98 @@
+import asyncio
+
+from app.services.llm.scheduler import Priority
+from app.services.rag import answer_cache
+from app.services.rag.answer_cache import AnswerCache
+
+
+def _fake_embeddings(monkeypatch, vectors):
+    async def fake_embed(question, priority=None):
+        return vectors[question]
+
+    monkeypatch.setattr(answer_cache, "embed_query", fake_embed)
+
+
+def test_concurrent_identical_questions_share_one_computation(monkeypatch):
+    _fake_embeddings(monkeypatch, {"where is ingestion?": [1.0, 0.0]})
+    cache = AnswerCache(maxsize=8, ttl_seconds=60, threshold=0.95)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": "ingest.py", "sources": []}
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_compute(("repo", 1, 8), "where is ingestion?", compute) for _ in range(3))
+        )
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert {r["answer"] for r in results} == {"ingest.py"}
+
+
+def test_near_duplicate_question_hits_within_same_generation_only(monkeypatch):
+    _fake_embeddings(monkeypatch, {
+        "where is ingestion?": [1.0, 0.0],
+        "where's the ingestion code": [0.99, 0.05],
+    })
+    cache = AnswerCache(maxsize=8, ttl_seconds=60, threshold=0.95)
+
+    async def compute():
+        return {"answer": "fresh", "sources": []}
+
+    async def main():
+        await cache.get_or_compute(("repo", 1, 8), "where is ingestion?", compute)
+        same_gen = await cache.get_or_compute(("repo", 1, 8), "where's the ingestion code", compute)
+        next_gen = await cache.get_or_compute(("repo", 2, 8), "where's the ingestion code", compute)
+        return same_gen, next_gen
+
+    same_gen, next_gen = asyncio.run(main())
+
+    assert same_gen["cached"] is True
+    assert "cached" not in next_gen
+
+
+def test_question_is_embedded_at_the_callers_priority(monkeypatch):
+    priorities = []
+
+    async def fake_embed(question, priority=None):
+        priorities.append(priority)
+        return [1.0, 0.0]
+
+    monkeypatch.setattr(answer_cache, "embed_query", fake_embed)
+    cache = AnswerCache(maxsize=8, ttl_seconds=60, threshold=0.95)
+
+    async def compute():
+        return {"answer": "fresh", "sources": []}
+
+    asyncio.run(cache.get_or_compute(("repo", 1, 8), "where is ingestion?", compute, Priority.BULK))
+
+    assert priorities == [Priority.BULK]
+
+
+def test_follower_takes_over_when_the_leading_request_is_cancelled(monkeypatch):
+    _fake_embeddings(monkeypatch, {"where is ingestion?": [1.0, 0.0]})
+    cache = AnswerCache(maxsize=8, ttl_seconds=60, threshold=0.95)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": "ingest.py", "sources": []}
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute(("repo", 1, 8), "where is ingestion?", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute(("repo", 1, 8), "where is ingestion?", compute))
+        await asyncio.sleep(0)
+        leader.cancel()  # e.g. the client disconnected
+        return await follower, leader.cancelled()
+
+    result, leader_cancelled = asyncio.run(main())
+
+    assert leader_cancelled
+    assert result["answer"] == "ingest.py"
+    assert len(calls) == 2  # the follower recomputed instead of failing
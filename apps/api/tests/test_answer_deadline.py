@@ -0,0 +1,51 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.rag import answerer
+from app.services.rag.answerer import RetrievedChunk
+from app.services.rag.deadline import plan_answer
+
+EXPECTED = {"gemini": 4000.0, "ollama": 15000.0, "local": 8000.0}
+
+
+def test_generous_deadline_keeps_the_full_answer():
+    plan = plan_answer(60000, 8, ["gemini", "ollama", "local"], EXPECTED)
+
+    assert (plan.provider, plan.k, plan.hints, plan.degradations) == ("gemini", 8, True, [])
+
+
+def test_tight_deadline_switches_tier_then_trims_the_prompt():
+    plan = plan_answer(10000, 8, ["ollama", "local"], EXPECTED)
+
+    assert plan.provider == "local"
+    assert plan.degradations == ["provider:local", "no_hints", "top_k:4"]
+
+
+def test_reranking_is_dropped_when_generation_leaves_little_slack(monkeypatch):
+    monkeypatch.setattr(settings, "RERANKER_MODEL", "test-cross-encoder")
+
+    tight = plan_answer(4500, 8, ["gemini"], EXPECTED)
+    generous = plan_answer(60000, 8, ["gemini"], EXPECTED)
+
+    assert tight.rerank is False
+    assert tight.degradations == ["no_rerank", "no_hints", "top_k:4"]
+    assert (generous.rerank, generous.degradations) == (True, [])
+
+
+def test_generation_is_cut_at_the_deadline_with_partial_output(monkeypatch):
+    async def fake_chunks(repo_oid, question, k, priority=None, rerank_spans=True):
+        return [RetrievedChunk(path="a.py", start_line=1, end_line=2, text="x = 1", score=1.0)]
+
+    async def slow_stream(prompt, prefer=None):
+        yield "Answer: partial"
+        await asyncio.sleep(5)
+        yield " never sent"
+
+    monkeypatch.setattr(answerer, "_evidence_chunks", fake_chunks)
+    monkeypatch.setattr(answerer.LLM_ROUTER, "stream", slow_stream)
+
+    rag = asyncio.run(answerer.generate_answer("repo", "where?", [], deadline_ms=500))
+
+    assert rag["answer"] == "Answer: partial"
+    assert "truncated" in rag["degradations"]
+    assert rag["sources"][0]["path"] == "a.py"
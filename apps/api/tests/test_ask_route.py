@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app.api.v1 import chat
+from app.core.config import settings
+from app.main import create_app
+from app.services.llm.router import LLM_ROUTER, Generation
+from app.services.llm.scheduler import LLM_SCHEDULER, ClassPolicy, Priority, _Waiter
+from app.services.rag import answer_cache, answerer, history
+from app.services.rag.answer_cache import ANSWER_CACHE
+from app.services.rag.answerer import RetrievedChunk
+
+REPO_ID = str(ObjectId())
+# Ollama context after a first turn packed to the 3200-token prompt budget, plus its answer
+FIRST_TURN_CONTEXT = list(range(3400))
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.docs if length is None else self.docs[:length])
+
+
+class FakeCollection:
+    """The handful of Motor calls the chat path makes, on plain dicts (equality queries only)."""
+
+    def __init__(self):
+        self.docs = []
+
+    def _matching(self, query):
+        return [d for d in self.docs if all(d.get(k) == v for k, v in query.items())]
+
+    async def find_one(self, query, projection=None):
+        found = self._matching(query)
+        return dict(found[0]) if found else None
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(d) for d in self._matching(query)])
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            await self.insert_one(doc)
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self._matching(query)[:1]:
+            doc.update(update.get("$set", {}))
+            for field in update.get("$unset", {}):
+                doc.pop(field, None)
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def _answer_calls(calls):
+    """Model calls that answered a question (not session summaries)."""
+    return [c for c in calls if c["prompt"].startswith("SYSTEM:")]
+
+
+@pytest.fixture
+def ask_env(monkeypatch):
+    """create_app() over an in-memory DB, fixed retrieval and a counting fake model."""
+    db = FakeDB()
+    calls = []
+
+    async def status(repo_id):
+        return {"indexed": True, "generation": 1}
+
+    async def generation(repo_id):
+        return 1
+
+    async def chunks(*args, **kwargs):
+        return [RetrievedChunk(path="app/api/v1/ingest.py", start_line=1, end_line=9, text="def ingest(): ...", score=1.0)]
+
+    async def embed(question, priority=None):
+        return [1.0, 0.0]
+
+    async def generate(prompt, *, context=None, context_prompt=None, prefer=None):
+        calls.append({"prompt": prompt, "context": context, "context_prompt": context_prompt})
+        return Generation(text="Answer: ingest.py [1]", provider="ollama", latency_ms=1.0,
+                          context=FIRST_TURN_CONTEXT, used_context=bool(context and context_prompt))
+
+    async def stream(prompt, prefer=None):
+        calls.append({"prompt": prompt, "stream": True})
+        yield "Answer: streamed [1]"
+
+    for module in (chat, history):
+        monkeypatch.setattr(module, "get_db", lambda: db)
+    monkeypatch.setattr(chat, "get_repo_status", status)
+    monkeypatch.setattr(chat, "retrieve_chunks", chunks)
+    monkeypatch.setattr(answerer, "_evidence_chunks", chunks)
+    monkeypatch.setattr(answerer, "get_index_generation", generation)
+    monkeypatch.setattr(answer_cache, "embed_query", embed)
+    monkeypatch.setattr(LLM_ROUTER, "generate", generate)
+    monkeypatch.setattr(LLM_ROUTER, "stream", stream)
+    monkeypatch.setattr(settings, "PREGENERATE_ANSWERS", False)
+    ANSWER_CACHE.cache.clear()
+
+    return SimpleNamespace(client=TestClient(create_app()), db=db, calls=calls)
+
+
+def test_repeated_first_turn_question_is_served_from_the_answer_cache(ask_env):
+    url = f"/api/v1/repos/{REPO_ID}/ask"
+
+    first = ask_env.client.post(url, json={"question": "Where is ingestion?"}).json()
+    second = ask_env.client.post(url, json={"question": "where is ingestion"}).json()
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["answer"] == first["answer"]
+    assert len(ask_env.calls) == 1
+    assert len(ask_env.db["chat_messages"].docs) == 4  # both turns saved after responding
+
+
+def test_follow_up_continues_a_full_sized_session_context(ask_env):
+    url = f"/api/v1/repos/{REPO_ID}/ask"
+    session_id = ask_env.client.post(url, json={"question": "Where is ingestion?"}).json()["session_id"]
+
+    ask_env.client.post(url, json={"question": "and chunking?", "session_id": session_id})
+
+    follow_up = _answer_calls(ask_env.calls)[-1]
+    assert follow_up["context"] == FIRST_TURN_CONTEXT
+    assert "and chunking?" in follow_up["context_prompt"]
+
+
+def test_streamed_turn_drops_the_session_model_context(ask_env):
+    base = f"/api/v1/repos/{REPO_ID}"
+    session_id = ask_env.client.post(f"{base}/ask", json={"question": "Where is ingestion?"}).json()["session_id"]
+    assert ask_env.db["chat_sessions"].docs[0]["llm_context"]["context"] == FIRST_TURN_CONTEXT
+
+    with ask_env.client.stream(
+        "POST", f"{base}/ask/stream", json={"question": "and chunking?", "session_id": session_id}
+    ) as r:
+        body = "".join(r.iter_text())
+    assert "event: done" in body
+    assert "llm_context" not in ask_env.db["chat_sessions"].docs[0]
+
+    ask_env.client.post(f"{base}/ask", json={"question": "and embeddings?", "session_id": session_id})
+
+    follow_up = _answer_calls(ask_env.calls)[-1]
+    assert follow_up["context"] is None and follow_up["context_prompt"] is None
+    assert "and chunking?" in follow_up["prompt"]  # the streamed turn is in the full prompt's history
+
+
+def test_ask_is_rejected_with_retry_after_when_the_interactive_queue_is_full(ask_env, monkeypatch):
+    loop = asyncio.new_event_loop()
+    # one generation running, one queued behind it, and no room for more
+    monkeypatch.setitem(LLM_SCHEDULER.policies, Priority.INTERACTIVE, ClassPolicy(1, 1, None))
+    monkeypatch.setitem(LLM_SCHEDULER._active, Priority.INTERACTIVE, 1)
+    monkeypatch.setitem(
+        LLM_SCHEDULER._queues, Priority.INTERACTIVE, deque([_Waiter(loop.create_future(), time.monotonic())])
+    )
+
+    r = ask_env.client.post(f"/api/v1/repos/{REPO_ID}/ask", json={"question": "Where is ingestion?"})
+    loop.close()
+
+    assert r.status_code == 503
+    assert int(r.headers["Retry-After"]) >= 1
+    assert ask_env.calls == []  # rejected before reaching the model
+    assert [m["role"] for m in ask_env.db["chat_messages"].docs] == ["user"]  # the question stays in the session
+
+
+def test_cache_hit_cancels_the_prefetched_retrieval(ask_env, monkeypatch):
+    url = f"/api/v1/repos/{REPO_ID}/ask"
+    ask_env.client.post(url, json={"question": "Where is ingestion?"})
+    events = []
+
+    async def slow_retrieval(*args, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("retrieval cancelled")
+            raise
+
+    async def status(repo_id):
+        await asyncio.sleep(0)  # a real lookup yields, so the prefetch gets going
+        return {"indexed": True, "generation": 1}
+
+    insert_many = ask_env.db["chat_messages"].insert_many
+
+    async def saving(docs, ordered=True):
+        await insert_many(docs, ordered)
+        await asyncio.sleep(0)  # a real write yields too
+        events.append("turn saved")
+
+    monkeypatch.setattr(chat, "get_repo_status", status)
+    monkeypatch.setattr(chat, "retrieve_chunks", slow_retrieval)
+    monkeypatch.setattr(ask_env.db["chat_messages"], "insert_many", saving)
+
+    assert ask_env.client.post(url, json={"question": "where is ingestion"}).json()["cached"] is True
+    # cancelled with the response, not left running until the loop shuts down
+    assert events[:2] == ["retrieval cancelled", "turn saved"]
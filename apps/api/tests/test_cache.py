@@ -0,0 +1,74 @@
+import asyncio
+
+from app.core.cache import SingleFlight, TTLCache
+from app.services.retrieval.cache import normalize_question
+
+
+def test_ttl_cache_counts_hits_and_evicts_lru():
+    cache = TTLCache("test_lru", maxsize=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b" (least recently used)
+
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache("test_ttl", maxsize=4, ttl_seconds=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_invalidate_by_predicate():
+    cache = TTLCache("test_invalidate", maxsize=4, ttl_seconds=60)
+    cache.set(("repo1", 1, "q", 8), ["x"])
+    cache.set(("repo2", 1, "q", 8), ["y"])
+
+    assert cache.invalidate(lambda key: key[0] == "repo1") == 1
+    assert cache.get(("repo2", 1, "q", 8)) == ["y"]
+
+
+def test_normalize_question_ignores_case_spacing_and_punctuation():
+    assert normalize_question("  Where is   Ingestion? ") == normalize_question("where is ingestion")
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [1.0]
+
+    async def main():
+        return await asyncio.gather(flight.run("q", compute), flight.run("q", compute))
+
+    assert asyncio.run(main()) == [[1.0], [1.0]]
+    assert len(calls) == 1
+
+
+def test_single_flight_follower_takes_over_from_a_cancelled_leader():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "chunks"
+
+    async def main():
+        leader = asyncio.create_task(flight.run("q", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.run("q", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(main()) == ("chunks", True)
+    assert len(calls) == 2
@@ -0,0 +1,46 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.rag import canonical
+
+
+def _stored(monkeypatch, docs, vectors):
+    async def fake_load(repo_id, generation):
+        return docs
+
+    async def fake_generation(repo_id):
+        return 1
+
+    async def fake_embed(question, priority=None):
+        return vectors[question]
+
+    monkeypatch.setattr(settings, "PREGENERATE_ANSWERS", True)
+    monkeypatch.setattr(canonical, "_load", fake_load)
+    monkeypatch.setattr(canonical, "get_index_generation", fake_generation)
+    monkeypatch.setattr(canonical, "embed_query", fake_embed)
+
+
+def test_canonical_question_matches_exactly_or_by_intent_and_similarity(monkeypatch):
+    doc = {
+        "normalized": "where does ingestion start",
+        "intent": "general",
+        "vector": [1.0, 0.0],
+        "answer": "Answer: app/api/v1/ingest.py",
+        "sources": [{"n": 1, "path": "app/api/v1/ingest.py"}],
+    }
+    _stored(monkeypatch, [doc], {
+        "Where is the entry point for ingesting?": [0.99, 0.05],
+        "Where are embeddings stored?": [0.2, 0.98],
+    })
+
+    exact = asyncio.run(canonical.match_canonical("repo", "where does ingestion start"))
+    similar = asyncio.run(canonical.match_canonical("repo", "Where is the entry point for ingesting?"))
+    other = asyncio.run(canonical.match_canonical("repo", "Where are embeddings stored?"))
+
+    assert exact["answer"] == similar["answer"] == "Answer: app/api/v1/ingest.py"
+    assert other is None
+
+
+def test_no_canonical_lookup_when_pregeneration_is_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "PREGENERATE_ANSWERS", False)
+    assert asyncio.run(canonical.match_canonical("repo", "where does ingestion start")) is None
@@ -0,0 +1,36 @@
+from app.services.indexing.chunker import chunk_text_by_lines
+from app.services.rag.answerer import RetrievedChunk
+from app.services.rag.spans import merge_chunks
+
+
+def _retrieved(path, chunk, score):
+    return RetrievedChunk(path=path, start_line=chunk.start_line, end_line=chunk.end_line, text=chunk.text, score=score)
+
+
+def test_overlapping_chunker_output_merges_into_one_span():
+    text = "\n".join(f"line_{i} = handler_{i}(request)" for i in range(1, 201))
+    chunks = chunk_text_by_lines(text, "app/x.py", max_chars=1800, overlap_lines=10)
+    assert len(chunks) >= 3
+
+    retrieved = [_retrieved("app/x.py", c, 0.1 * i) for i, c in enumerate(chunks[:3])]
+    retrieved.insert(1, RetrievedChunk(path="app/y.py", start_line=1, end_line=2, text="a\nb", score=0.9))
+
+    merged = merge_chunks(list(reversed(retrieved)))
+
+    x = next(c for c in merged if c.path == "app/x.py")
+    assert (x.start_line, x.end_line) == (chunks[0].start_line, chunks[2].end_line)
+    assert x.text == "\n".join(text.splitlines()[x.start_line - 1:x.end_line])
+    assert x.score == 0.2
+    assert [c.path for c in merged] == ["app/x.py", "app/y.py"]
+
+
+def test_disjoint_spans_and_duplicates():
+    a = RetrievedChunk(path="a.py", start_line=1, end_line=3, text="x\ny\nz", score=0.5)
+    dup = RetrievedChunk(path="a.py", start_line=1, end_line=3, text="x\ny\nz", score=0.7)
+    far = RetrievedChunk(path="a.py", start_line=10, end_line=11, text="p\nq", score=0.4)
+    adjacent = RetrievedChunk(path="a.py", start_line=4, end_line=5, text="w\nv", score=0.1)
+
+    merged = merge_chunks([far, a, dup, adjacent])
+
+    assert [(c.start_line, c.end_line) for c in merged] == [(10, 11), (1, 5)]
+    assert merged[1].text == "x\ny\nz\nw\nv" and merged[1].score == 0.7
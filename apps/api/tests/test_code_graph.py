@@ -0,0 +1,96 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.services.analysis import graph as graph_module
+from app.services.analysis.graph import (
+    EDGE_CALL,
+    EDGE_IMPORT,
+    CodeGraph,
+    build_code_graph,
+)
+
+FILES = [
+    {
+        "path": "app/api/chat.py",
+        "text": (
+            "from app.services.answerer import generate_answer\n"
+            "async def ask_repo(q):\n"
+            "    return await generate_answer(q)\n"
+        ),
+    },
+    {
+        "path": "app/services/answerer.py",
+        "text": (
+            "def retrieve(q):\n"
+            "    return []\n"
+            "async def generate_answer(q):\n"
+            "    chunks = retrieve(q)\n"
+            "    return build_prompt(q, chunks)\n"
+        ),
+    },
+    {
+        "path": "app/services/prompt.py",
+        "text": "def build_prompt(q, chunks):\n    return q\n",
+    },
+]
+
+
+def test_graph_resolves_multi_hop_calls_across_files():
+    graph = build_code_graph(FILES)
+    (start,) = graph.find("ask_repo")
+
+    walk = graph.walk(start)
+
+    assert walk["path"] == [
+        "app.api.chat.ask_repo",
+        "app.services.answerer.generate_answer",
+        "app.services.answerer.retrieve",
+        "app.services.prompt.build_prompt",
+    ]
+
+
+def test_graph_records_import_edges_and_round_trips_through_doc():
+    graph = build_code_graph(FILES)
+    (chat_module,) = [i for i, n in enumerate(graph.nodes) if n["qualname"] == "app.api.chat"]
+
+    imported = graph.successors(chat_module, EDGE_IMPORT)
+    restored = CodeGraph.from_doc(graph.to_doc())
+
+    assert [graph.nodes[i]["qualname"] for i in imported] == ["app.services.answerer"]
+    assert restored.walk(graph.find("ask_repo")[0]) == graph.walk(graph.find("ask_repo")[0])
+
+
+def test_names_passed_as_arguments_are_not_call_edges():
+    files = [{
+        "path": "app/jobs.py",
+        "text": (
+            "def run_job(x):\n"
+            "    return x\n"
+            "def schedule(tasks, x):\n"
+            "    tasks.add_task(run_job, x)\n"
+        ),
+    }]
+    graph = build_code_graph(files)
+    (schedule,) = graph.find("schedule")
+
+    assert graph.successors(schedule, EDGE_CALL) == []
+
+
+def test_oversized_graph_is_not_persisted_and_drops_the_stale_one(monkeypatch):
+    calls = []
+
+    class Graphs:
+        async def replace_one(self, *args, **kwargs):
+            calls.append("replace_one")
+
+        async def delete_one(self, query):
+            calls.append("delete_one")
+
+    monkeypatch.setattr(graph_module, "get_db", lambda: {graph_module.CODE_GRAPHS: Graphs()})
+    monkeypatch.setattr(graph_module, "MAX_GRAPH_DOC_BYTES", 100)
+
+    persisted = asyncio.run(graph_module._save_graph(ObjectId(), ObjectId(), build_code_graph(FILES)))
+
+    assert persisted is False
+    assert calls == ["delete_one"]
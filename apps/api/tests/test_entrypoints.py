@@ -0,0 +1,72 @@
+import asyncio
+
+from app.services.analysis import architecture
+from app.services.analysis.entrypoints import detect_file_entrypoints
+from app.services.analysis.graph import build_code_graph
+
+CODE = '''
+from fastapi import APIRouter, BackgroundTasks, FastAPI
+
+app = FastAPI(title="demo")
+router = APIRouter()
+
+@router.post("/ingest")
+async def ingest_repo(background_tasks: BackgroundTasks):
+    background_tasks.add_task(run_ingest_job, "repo")
+
+@app.on_event("startup")
+async def _startup():
+    asyncio.create_task(warm_up())
+'''
+
+
+def test_detects_app_routes_and_background_work_from_ast():
+    found = detect_file_entrypoints("app/main.py", CODE)
+
+    assert found["application"][0]["symbol"] == "app = FastAPI()"
+    assert found["api_routes"] == [{
+        "symbol": "ingest_repo",
+        "method": "POST",
+        "route": "/ingest",
+        "line": 8,
+        "description": "HTTP endpoint",
+    }]
+    assert [j["symbol"] for j in found["background_jobs"]] == ["run_ingest_job", "warm_up"]
+
+
+def test_unparseable_file_falls_back_to_regexes():
+    found = detect_file_entrypoints("broken.py", "@router.get('/x')\ndef broken(:\n")
+
+    assert found["api_routes"][0]["symbol"] == "API route"
+    assert found["api_routes"][0]["method"] is None and found["api_routes"][0]["route"] is None
+    assert "file" not in found["api_routes"][0]
+
+
+def test_architecture_skips_routes_from_unparseable_files(monkeypatch):
+    files = [
+        {"path": "app/api/routes.py", "text": "@router.get('/ok')\nasync def ok():\n    return helper()\n"
+                                          "def helper():\n    return 1\n"},
+        {"path": "app/api/broken.py", "text": "@router.get('/x')\ndef broken(:\n"},
+    ]
+
+    async def fake_entrypoints(repo_id, job_id):
+        found = {"application": [], "api_routes": [], "background_jobs": []}
+        for f in files:
+            for kind, items in detect_file_entrypoints(f["path"], f["text"]).items():
+                found[kind].extend({"file": f["path"], **item} for item in items)
+        return found
+
+    async def fake_graph(repo_id):
+        return build_code_graph(files)
+
+    async def fake_job(repo_id):
+        return None
+
+    monkeypatch.setattr(architecture, "detect_repo_entrypoints", fake_entrypoints)
+    monkeypatch.setattr(architecture, "get_code_graph", fake_graph)
+    monkeypatch.setattr(architecture, "get_indexed_job_id", fake_job)
+
+    flows = asyncio.run(architecture.build_architecture("repo"))
+
+    assert [f["entrypoint"] for f in flows] == ["GET /ok"]
+    assert flows[0]["path"] == ["app.api.routes.ok", "app.api.routes.helper"]
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_importing_the_app_does_not_load_provider_sdks():
+    code = (
+        "import sys, app.main\n"
+        "heavy = [m for m in ('torch', 'transformers', 'google.genai') if m in sys.modules]\n"
+        "print(','.join(heavy))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=API_DIR, capture_output=True, text=True, check=True)
+
+    assert out.stdout.strip() == ""
+
+
+def test_registry_imports_provider_on_first_use():
+    from app.services.llm.registry import provider_class
+
+    assert provider_class("ollama").__name__ == "OllamaLLM"
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.llm.router import CircuitBreaker, ProviderRouter
+
+
+class _Provider:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    async def generate(self, prompt):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return f"{self.name}: {prompt}"
+
+    async def generate_in_context(self, prompt, context=None):
+        return await self.generate(prompt), [1, 2, 3]
+
+
+def test_open_breaker_skips_failed_primary(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "auto")
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "key")
+    router = ProviderRouter(failure_threshold=2, reset_seconds=60)
+    gemini, ollama = _Provider("gemini", fail=True), _Provider("ollama")
+    router._instances.update({"gemini": gemini, "ollama": ollama})
+
+    async def main():
+        return [await router.generate("q") for _ in range(4)]
+
+    results = asyncio.run(main())
+
+    assert [r.provider for r in results] == ["ollama"] * 4
+    assert gemini.calls == 2  # tripped after two failures, then skipped without a call
+    assert results[-1].skipped == ["gemini"]
+    assert router.stats()["providers"]["gemini"]["state"] == "open"
+
+
+def test_breaker_half_opens_for_a_single_trial(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("app.services.llm.router.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock[0] = 10.0
+    assert breaker.allow()  # the trial call
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.services.llm.scheduler import ClassPolicy, LLMScheduler, Priority, SchedulerSaturatedError
+
+
+def _scheduler(max_concurrency=1, max_queue=8, max_wait=None):
+    return LLMScheduler(
+        max_concurrency=max_concurrency,
+        policies={p: ClassPolicy(concurrency=1, max_queue=max_queue, max_wait_seconds=max_wait) for p in Priority},
+    )
+
+
+def test_interactive_waiters_are_served_before_bulk():
+    sched = _scheduler()
+    order = []
+
+    async def job(name, priority):
+        async with sched.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def main():
+        await sched.acquire(Priority.BULK)  # occupy the only slot
+        tasks = [
+            asyncio.create_task(job("bulk", Priority.BULK)),
+            asyncio.create_task(job("background", Priority.BACKGROUND)),
+            asyncio.create_task(job("interactive", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        sched.release(Priority.BULK)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert order == ["interactive", "background", "bulk"]
+
+
+def test_full_queue_and_queue_timeout_raise_saturated():
+    sched = _scheduler(max_queue=1, max_wait=0.01)
+
+    async def main():
+        await sched.acquire(Priority.INTERACTIVE)
+        waiting = asyncio.create_task(sched.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerSaturatedError) as full:
+            await sched.acquire(Priority.INTERACTIVE)
+        with pytest.raises(SchedulerSaturatedError) as timed_out:
+            await waiting
+        return full.value, timed_out.value
+
+    full, timed_out = asyncio.run(main())
+
+    assert full.reason == "queue full" and full.retry_after >= 1
+    assert timed_out.reason == "queue timeout"
+    stats = sched.stats()["classes"]["interactive"]
+    assert stats["rejected"] == 1 and stats["timed_out"] == 1 and stats["queued"] == 0
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.llm import local_t5
+
+
+def test_concurrent_generations_share_one_model_call(monkeypatch):
+    calls = []
+
+    def fake_batch(prompts, max_new_tokens):
+        calls.append((list(prompts), max_new_tokens))
+        return [p.upper() for p in prompts]
+
+    monkeypatch.setattr(local_t5, "_generate_batch_sync", fake_batch)
+    monkeypatch.setattr(settings, "LOCAL_LLM_MAX_BATCH", 3)
+    monkeypatch.setattr(settings, "LOCAL_LLM_BATCH_WAIT_MS", 50)
+    monkeypatch.setattr(local_t5, "_BATCHER", local_t5._MicroBatcher())
+    llm = local_t5.LocalT5LLM()
+
+    async def main():
+        return await asyncio.gather(
+            llm.generate("a", max_new_tokens=10),
+            llm.generate("b", max_new_tokens=20),
+            llm.generate("c"),
+            llm.generate("d"),
+        )
+
+    results = asyncio.run(main())
+
+    assert results == ["A", "B", "C", "D"]
+    assert calls == [(["a", "b", "c"], 350), (["d"], 350)]
@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+import httpx
+
+from app.core import http
+from app.core.config import settings
+from app.services.llm.ollama_llm import OllamaLLM
+
+
+def _use_transport(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http, "_client", client)
+    return client
+
+
+def test_generate_and_stream_share_the_pooled_client(monkeypatch):
+    def handler(request):
+        payload = json.loads(request.content)
+        assert payload["options"]["num_ctx"] == settings.OLLAMA_NUM_CTX
+        if payload["stream"]:
+            lines = [{"response": "Hel"}, {"response": "lo"}, {"done": True}]
+            return httpx.Response(200, text="\n".join(json.dumps(x) for x in lines))
+        return httpx.Response(200, json={"response": " Hello \n"})
+
+    client = _use_transport(monkeypatch, handler)
+    llm = OllamaLLM(model="m", base_url="http://ollama")
+
+    async def main():
+        full = await llm.generate("hi")
+        pieces = [p async for p in llm.stream("hi")]
+        return full, pieces
+
+    full, pieces = asyncio.run(main())
+
+    assert full == "Hello"
+    assert pieces == ["Hel", "lo"]
+    assert http.get_http_client() is client
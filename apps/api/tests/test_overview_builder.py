@@ -0,0 +1,20 @@
+from bson import ObjectId
+
+from app.services.overview.builder import TECH_KEYWORDS, overview_pipeline
+
+
+def test_overview_pipeline_projects_only_flags_and_groups_by_path():
+    pipeline = overview_pipeline(ObjectId())
+    project = pipeline[1]["$project"]
+    group = pipeline[2]["$group"]
+
+    assert "text" not in project
+    assert group["_id"] == "$path"
+    assert len([k for k in group if k.startswith("t")]) == len(TECH_KEYWORDS)
+
+
+def test_overview_pipeline_matches_keywords_case_insensitively():
+    flag = overview_pipeline(ObjectId())[1]["$project"]["t0"]["$regexMatch"]
+
+    assert flag["options"] == "i"
+    assert flag["regex"] == "fastapi|APIRouter"
@@ -0,0 +1,60 @@
+from app.services.rag.answerer import RetrievedChunk
+from app.services.rag.packer import estimate_tokens, pack_followup, pack_prompt
+
+
+def _chunk(path, lines, start=1):
+    text = "\n".join(f"value_{i} = compute_{i}(x)" for i in range(lines))
+    return RetrievedChunk(path=path, start_line=start, end_line=start + lines - 1, text=text, score=1.0)
+
+
+def test_unbounded_pack_keeps_everything():
+    chunks = [_chunk("app/a.py", 10), _chunk("app/b.py", 10)]
+    history = [{"role": "user", "content": "where is ingest?"}]
+
+    packed = pack_prompt("how is x computed?", chunks, history)
+
+    assert packed.chunks == chunks
+    assert "[2] app/b.py:1-10" in packed.prompt
+    assert "USER: where is ingest?" in packed.prompt
+    assert packed.usage["dropped"] == {"chunks": 0, "history_messages": 0}
+
+
+def test_budget_drops_low_ranked_chunks_and_old_history():
+    chunks = [_chunk("app/a.py", 40), _chunk("app/b.py", 40), _chunk("app/c.py", 40)]
+    history = [{"role": "user", "content": "old question " * 200}, {"role": "assistant", "content": "recent"}]
+
+    packed = pack_prompt("how is x computed?", chunks, history, budget=800)
+
+    assert [c.path for c in packed.chunks] == ["app/a.py"]
+    assert "ASSISTANT: recent" in packed.prompt and "old question" not in packed.prompt
+    assert packed.usage["dropped"] == {"chunks": 2, "history_messages": 1}
+    assert packed.usage["estimated_tokens"] == estimate_tokens(packed.prompt) <= 800
+    assert sum(packed.usage["sections"].values()) == packed.usage["estimated_tokens"]
+
+
+def test_top_chunk_is_cut_to_fit_instead_of_dropped():
+    packed = pack_prompt("how is x computed?", [_chunk("app/a.py", 400, start=10)], [], budget=900)
+
+    (chunk,) = packed.chunks
+    assert chunk.start_line == 10 and chunk.end_line < 409
+    assert f"[1] app/a.py:10-{chunk.end_line}" in packed.prompt
+    assert packed.usage["estimated_tokens"] <= 900
+
+
+def test_prompt_keeps_stable_parts_first():
+    chunks = [_chunk("app/a.py", 5)]
+    first = pack_prompt("where is x?", chunks, [{"role": "user", "content": "where is x?"}]).prompt
+    second = pack_prompt("and y?", chunks, [{"role": "summary", "content": "asked about x"}]).prompt
+
+    prefix = first[: first.index("CHAT HISTORY:")]
+    assert second.startswith(prefix)
+    assert "EVIDENCE CITATIONS" in prefix
+
+
+def test_followup_sends_only_new_evidence_numbered_after_known():
+    packed = pack_followup("and b?", [_chunk("app/b.py", 5)], first_number=3, budget=500)
+
+    assert [c.path for c in packed.chunks] == ["app/b.py"]
+    assert "[3] app/b.py:1-5" in packed.prompt
+    assert "SYSTEM:" not in packed.prompt
+    assert pack_followup("and b?", [], first_number=3, budget=10) is None
@@ -1,7 +1,10 @@
+import pytest
+
+from app.services.indexing.features import chunk_features
 from app.services.rag.answerer import (
+    CandidateScorer,
     _intent_profile,
     _question_keywords,
-    _rank_candidate,
 )
 from app.services.rag.intent import classify_intent
 
@@ -23,7 +26,7 @@ def test_question_keywords_prioritize_meaningful_terms():
     assert "the" not in keywords
 
 
-def test_rank_candidate_prefers_path_and_text_matches():
+def test_candidate_scorer_prefers_path_and_text_matches():
     profile = _intent_profile("api_flow")
     keywords = _question_keywords("How does ask_repo generate an answer?", extra=profile["keywords"])
 
@@ -38,7 +41,52 @@ def test_rank_candidate_prefers_path_and_text_matches():
         "score": 0.79,
     }
 
-    chat_score = _rank_candidate(chat_row, keywords=keywords, path_hints=profile["path_hints"])
-    indexing_score = _rank_candidate(indexing_row, keywords=keywords, path_hints=profile["path_hints"])
+    chat_score, indexing_score = CandidateScorer(keywords, profile["path_hints"]).scores([chat_row, indexing_row])
 
     assert chat_score > indexing_score
+
+
+@pytest.mark.parametrize(
+    ("question", "text"),
+    [
+        ("Where is the github blob fetched?",
+         "async def get_blob_by_api_url(self, blob_api_url): ...  # fetch github blob"),
+        # keywords inside longer words: plurals and prefixes
+        ("How do ingest, chunk and embedding work?",
+         "def ingestion_job(repo): chunks = split(repo); embeddings = embed_texts(chunks)"),
+    ],
+)
+def test_candidate_scorer_scores_stored_terms_like_text(question, text):
+    keywords = _question_keywords(question)
+    with_text = {"path": "app/services/ingestion/github_client.py", "text": text, "score": 0.4}
+    with_terms = {
+        "path": "app/services/ingestion/github_client.py",
+        "score": 0.4,
+        **chunk_features(text),
+    }
+    bare = {"path": "app/services/ingestion/github_client.py", "score": 0.4, "terms": []}
+
+    with_terms_score, with_text_score, bare_score = CandidateScorer(keywords, []).scores(
+        [with_terms, with_text, bare]
+    )
+
+    assert with_terms_score == with_text_score > bare_score
+
+
+def test_candidate_scorer_ranks_and_filters_by_path():
+    profile = _intent_profile("repo_ingestion")
+    keywords = _question_keywords("How does repo ingestion work end to end?", extra=profile["keywords"])
+    rows = [
+        {"path": "app/services/ingestion/file_tree.py", "start_line": 1, "score": 0.3,
+         **chunk_features("async def ingest_github_file_tree(repo_doc, job_doc): chunk files " * 2)},
+        {"path": "app/services/ingestion/file_tree.py", "start_line": 40, "score": 0.2, "text": "index repo files"},
+        {"path": "README.md", "score": 0.9, "text_len": 500, "terms": ["ingestion"]},
+        {"path": "app/ui/page.tsx", "score": 0.95, "text_len": 500, "terms": []},
+    ]
+    scorer = CandidateScorer(keywords, profile["path_hints"])
+
+    ranked = scorer.rank(rows)
+    kept = scorer.filter(ranked, min_len=80, require_hint=True)
+
+    assert ranked[0]["start_line"] == 1  # hint and keyword hits outweigh the raw vector score
+    assert [r["path"] for r in kept] == ["app/services/ingestion/file_tree.py"] * 2
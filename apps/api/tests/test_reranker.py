@@ -0,0 +1,35 @@
+import asyncio
+
+from app.core.config import settings
+from app.services.rag import reranker
+from app.services.rag.answerer import RetrievedChunk
+
+
+def _chunk(path: str, text: str) -> RetrievedChunk:
+    return RetrievedChunk(path=path, start_line=1, end_line=5, text=text, score=0.5)
+
+
+def test_rerank_keeps_top_n_and_scores_each_pair_once(monkeypatch):
+    batches = []
+
+    def fake_scores(pairs):
+        batches.append(len(pairs))
+        return [float(len(passage)) for _, passage in pairs]
+
+    monkeypatch.setattr(settings, "RERANKER_MODEL", "test-cross-encoder")
+    monkeypatch.setattr(reranker, "_score_batch_sync", fake_scores)
+    reranker.SCORE_CACHE.clear()
+    chunks = [_chunk("a.py", "x"), _chunk("b.py", "xxx"), _chunk("c.py", "xx")]
+
+    first = asyncio.run(reranker.rerank("where is x?", chunks, top_n=2))
+    again = asyncio.run(reranker.rerank("Where is x", chunks, top_n=2))
+
+    assert [c.path for c in first] == [c.path for c in again] == ["b.py", "c.py"]
+    assert batches == [3]  # one batched pass, then served from SCORE_CACHE
+
+
+def test_rerank_is_a_no_op_without_a_model(monkeypatch):
+    monkeypatch.setattr(settings, "RERANKER_MODEL", "")
+    chunks = [_chunk("a.py", "x"), _chunk("b.py", "xxx")]
+
+    assert asyncio.run(reranker.rerank("q", chunks, top_n=1)) == chunks
@@ -0,0 +1,24 @@
+from app.services.retrieval.fusion import reciprocal_rank_fusion
+
+
+def _key(row):
+    return row["path"]
+
+
+def test_rrf_rewards_rows_found_by_both_legs():
+    vector = [{"path": "a.py", "score": 0.91}, {"path": "b.py", "score": 0.88}]
+    lexical = [{"path": "c.py"}, {"path": "b.py"}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], key=_key)
+
+    assert fused[0]["path"] == "b.py"
+    assert {r["path"] for r in fused} == {"a.py", "b.py", "c.py"}
+
+
+def test_rrf_ignores_raw_leg_scores():
+    vector = [{"path": "a.py", "score": 0.2}]
+    lexical = [{"path": "b.py", "score": 50.0}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], key=_key)
+
+    assert fused[0]["score"] == fused[1]["score"]
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from app.services.rag.answerer import RetrievedChunk
+from app.services.rag.history import history_from, summary_prompt
+from app.services.rag.packer import pack_prompt
+
+
+def test_summary_prompt_folds_new_messages_into_current_summary():
+    prompt = summary_prompt(
+        "User asked where ingestion starts (app/api/v1/ingest.py).",
+        [{"role": "user", "content": "and embeddings?"}, {"role": "assistant", "content": "indexer.py"}],
+    )
+
+    assert "CURRENT SUMMARY:\nUser asked where ingestion starts" in prompt
+    assert "USER: and embeddings?\nASSISTANT: indexer.py" in prompt
+
+
+def test_summary_history_renders_before_the_verbatim_turn():
+    history = [
+        {"role": "summary", "content": "Discussed ingestion in app/api/v1/ingest.py."},
+        {"role": "user", "content": "what about chunking?"},
+    ]
+    chunk = RetrievedChunk(path="a.py", start_line=1, end_line=1, text="x = 1", score=1.0)
+
+    prompt = pack_prompt("what about chunking?", [chunk], history).prompt
+
+    assert "CHAT HISTORY:\nSUMMARY: Discussed ingestion" in prompt
+    assert "\nUSER: what about chunking?" in prompt
+
+
+def test_history_from_skips_messages_folded_into_the_summary():
+    session = {"summary": "Discussed ingestion.", "summary_upto": datetime(2024, 1, 1, 10, 1)}
+    msgs = [
+        {"role": "user", "content": "where is ingestion?", "created_at": datetime(2024, 1, 1, 10, 0)},
+        {"role": "assistant", "content": "ingest.py", "created_at": datetime(2024, 1, 1, 10, 1)},
+        {"role": "user", "content": "and chunking?", "created_at": datetime(2024, 1, 1, 10, 2)},
+    ]
+
+    assert history_from(session, msgs) == [
+        {"role": "summary", "content": "Discussed ingestion."},
+        {"role": "user", "content": "and chunking?"},
+    ]
+    assert len(history_from({}, msgs)) == 3
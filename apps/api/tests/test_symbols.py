@@ -0,0 +1,40 @@
+from app.services.indexing.symbol_index import SymbolTable
+from app.services.rag.answerer import _question_identifiers
+from app.services.rag.symbols import extract_python_symbols
+
+CODE = '''
+class GitHubClient:
+    def get_tree(self, owner, repo, sha):
+        return {}
+
+async def ingest_github_file_tree(repo_doc, job_doc):
+    def _inner():
+        pass
+'''
+
+
+def test_extract_python_symbols_reports_qualified_names_and_methods():
+    hits = {h.qualname: h for h in extract_python_symbols(CODE)}
+
+    assert hits["GitHubClient"].kind == "class"
+    assert hits["GitHubClient.get_tree"].kind == "method"
+    assert hits["ingest_github_file_tree"].kind == "function"
+    assert hits["ingest_github_file_tree._inner"].kind == "function"
+    assert hits["GitHubClient.get_tree"].lineno == 3
+
+
+def test_question_identifiers_picks_code_like_terms():
+    names = _question_identifiers("Where is `ingest_github_file_tree` and GitHubClient.get_tree()?")
+
+    assert "ingest_github_file_tree" in names
+    assert "GitHubClient.get_tree" in names
+    assert "Where" not in names
+
+
+def test_symbol_table_lookup_by_name_or_qualname():
+    row = {"name": "get_tree", "qualname": "GitHubClient.get_tree", "path": "gh.py", "start_line": 3}
+    table = SymbolTable(by_name={"get_tree": [row]}, by_qualname={"githubclient.get_tree": [row]})
+
+    assert table.lookup("get_tree()") == [row]
+    assert table.lookup("GitHubClient.get_tree") == [row]
+    assert table.lookup("missing") == []